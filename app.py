@@ -1,51 +1,159 @@
 import streamlit as st
-import sys
 import pandas as pd
-import pickle as pkl
-import base64
+import io
+import json
+import os
+import tempfile
+import time
 
 from tinymongo.columns import COLUMN_TYPES
 from tinymongo.db import Database, Table
+from tinymongo.importers import import_rows, read_frame
+from tinymongo.profiling import PROFILER, profiled
+from tinymongo.query import QueryError
+from tinymongo.snapshot import read_header
+from tinymongo.storage import Store
 from tinymongo.style import setup_style
 from tinymongo.translation import Translation, TranslationCN
+from tinymongo.versioning import History, diff
 
-from tinymongo.exporters.python import export as export_python
-from tinymongo.exporters.csharp import export as export_csharp
+from tinymongo.exporters.python import export_to as export_python_to, pool_report as python_pool_report
+from tinymongo.exporters.csharp import export_to as export_csharp_to, pool_report as csharp_pool_report
+from tinymongo.exporters.binary import export_to as export_binary_to
+from tinymongo.exporters.cache import EXPORT_CACHE
 
+rerun_start = time.perf_counter()
 sidebar = st.sidebar
+# the switch is per thread and every rerun gets a new one, so it is set before anything timed runs
+PROFILER.enabled = st.session_state.get('profiling', False)
 
 st.set_page_config(layout="wide")
 setup_style()
 
 tr = TranslationCN
 
-DB_KEY = 'database/db'
-DRAFT_DF_KEY = 'tmp/draft_df'
+CURRENT_TABLE_KEY = 'session/current_table'
+VIEW_CACHE_KEY = 'session/view_ids'
+PAGE_CACHE_KEY = 'session/page'
+CONFLICT_KEY = 'tmp/conflict'
+REJECTED_KEY = 'tmp/rejected'
+DRAFT_KEY = 'tmp/draft'
+EDITOR_VERSION_KEY = 'tmp/editor_version'
 IMPORT_DB_KEY = 'tmp/import_db'
 COPY_REF_KEY = 'tmp/copy_ref'
 
-# force pickle to work
-__main__ = sys.modules['__main__']
-__main__.Database = Database
-__main__.Table = Table
-                       
-if DB_KEY not in st.session_state:
-    st.session_state[DB_KEY] = Database('db')
-db: Database = st.session_state[DB_KEY]
+VIOLATION_COLUMN = '⚠'
 
-def save_draft_df():
-    if DRAFT_DF_KEY in st.session_state and db.current_table:
-        db.current_table.df = st.session_state.pop(DRAFT_DF_KEY)
+MAX_SHOWN_ERRORS = 20
+MAX_SEARCH_HITS = 20
+PAGE_SIZES = [50, 100, 500, 1000, 5000]
+
+# directory of the on-disk store; without it the database only lives in the session
+STORE_PATH = os.environ.get('TINYMONGO_STORE')
+# memory the undo history may use before dropping its oldest versions
+HISTORY_BUDGET = int(os.environ.get('TINYMONGO_HISTORY_MB', 64)) * 1024 * 1024
+
+@st.cache_resource
+def open_store(path: str) -> Store:
+    store = Store(path)
+    store.open()
+    return store
+
+@st.cache_resource
+def shared_state() -> dict:
+    # one database and undo history for every session of this server process
+    db = open_store(STORE_PATH).db if STORE_PATH else Database('db')
+    return {'db': db, 'history': History(db, HISTORY_BUDGET)}
+
+shared = shared_state()
+db: Database = shared['db']
+history: History = shared['history']
+
+# which table a session shows is its own; forget it once the table is gone
+current_table: Table | None = st.session_state.get(CURRENT_TABLE_KEY)
+if current_table is not None and db.tables.get(current_table.name) is not current_table:
+    current_table = st.session_state[CURRENT_TABLE_KEY] = None
+
+def set_current_table(table_name: str) -> Table | None:
+    st.session_state[CURRENT_TABLE_KEY] = db.tables.get(table_name)
+    return st.session_state[CURRENT_TABLE_KEY]
+
+def cached(cache_key: str, key: tuple, compute):
+    # per-session results, kept until `key` (which includes the table version) changes
+    entry = st.session_state.get(cache_key)
+    if entry is None or entry[0] != key:
+        entry = st.session_state[cache_key] = (key, compute())
+    return entry[1]
+
+@profiled('save_draft')
+def save_draft():
+    # the editor only reports deltas against the window it was given; map positions back to ids
+    draft = st.session_state.pop(DRAFT_KEY, None)
+    if draft is None or draft[0] not in db.tables:
+        return
+    table_name, editor_key, ids, version = draft
+    delta = st.session_state.get(editor_key)
+    if not delta or not any(delta.values()):
+        return
+    table = db.tables[table_name]
+    stale = table.version != version
+    edited = {ids[int(pos)]: values for pos, values in delta.get('edited_rows', {}).items()}
+    deleted = [ids[int(pos)] for pos in delta.get('deleted_rows', [])]
+    patch = table.patch(edited, delta.get('added_rows', []), deleted)
+    # another session changed the table meanwhile; edits to rows it deleted are lost
+    lost = len(edited) - len(patch.ids) + len(deleted) - len(patch.deleted)
+    if stale and lost:
+        st.session_state[CONFLICT_KEY] = lost
+    if patch.rejected:
+        st.session_state[REJECTED_KEY] = patch.rejected
+    # the applied edits are now part of the data, so start the editor afresh
+    st.session_state[EDITOR_VERSION_KEY] = st.session_state.get(EDITOR_VERSION_KEY, 0) + 1
+
+def view_changed():
+    # callbacks run before the script, so they set the profiling switch themselves
+    PROFILER.enabled = st.session_state.get('profiling', False)
+    save_draft()
+
+# everything changed by the previous run and by callbacks becomes one version
+history.commit()
 
 if db.tables:
     for table_name in db.tables:
-        if db.current_table is not None and db.current_table.name == table_name:
+        if current_table is not None and current_table.name == table_name:
             button_type = 'primary'
         else:
             button_type = 'secondary'
         if sidebar.button(table_name, key=table_name, use_container_width=True, type=button_type):
-            save_draft_df()
-            db.set_current_table(table_name)
+            save_draft()
+            set_current_table(table_name)
+            st.rerun()
+
+# search every table; a hit opens its table filtered down to that row
+search_text = sidebar.text_input(tr.Search, key='search', placeholder=tr.SearchPlaceholder)
+if search_text.strip():
+    hits = db.search(search_text, MAX_SEARCH_HITS)
+    if not hits:
+        sidebar.caption(tr.NoSearchHits)
+    for hit in hits:
+        value = str(db.tables[hit.table].df.at[hit.row, hit.column])[:40]
+        if sidebar.button(f'{hit.table} #{hit.row} · {hit.column}: {value}', key=f'search/{hit.table}/{hit.row}/{hit.column}',
+                          use_container_width=True):
+            save_draft()
+            set_current_table(hit.table)
+            st.session_state[f'view/{hit.table}/query'] = json.dumps({'id': hit.row})
+            st.rerun()
+
+if current_table is not None:
+    _0, _1 = sidebar.columns(2)
+    new_table_name = _0.text_input("Rename table", label_visibility="collapsed")
+    if _1.button(tr.RenameTable) and new_table_name:
+        if not new_table_name.isidentifier():
+            sidebar.error(tr.InvalidName)
+        elif new_table_name in db.tables:
+            sidebar.error(tr.TableExists.format(new_table_name))
+        else:
+            save_draft()
+            db.rename_table(current_table.name, new_table_name)
             st.rerun()
 
 sidebar.subheader(tr.CreateTable)
@@ -60,45 +168,47 @@ if _1.button(tr.CreateTable):
                 sidebar.error(tr.TableExists.format(table_name))
             else:
                 db.create_table(table_name)
-                save_draft_df()
-                db.set_current_table(table_name)
+                save_draft()
+                set_current_table(table_name)
                 st.rerun()
 
 sub_cols = st.columns([1, 1, 1, 1.2, 1, 1])
 
 # add row
-if sub_cols[0].button(tr.InsertRow) and db.current_table:
-    assert len(db.current_table.df.columns) > 0
-    save_draft_df()
-    df = db.current_table.df
-    data = {col: db.current_table.get_column_type(col).default for col in df.columns}
-    next_id = db.current_table.next_id()
-    df.loc[next_id] = data
-
-    selected_idx = df.index[df['?'] == True]
+insert_count = sub_cols[3].number_input(tr.InsertCount, min_value=1, max_value=10000, value=1, label_visibility="collapsed")
+if sub_cols[0].button(tr.InsertRow) and current_table:
+    assert len(current_table.df.columns) > 0
+    save_draft()
+    table = current_table
+    selected_idx = table.df.index[table.df['?'] == True]
     if len(selected_idx) > 0:
-        new_index = df.index.to_list()
-        new_index.pop()     # remove last index
-        insert_pos = new_index.index(selected_idx[-1]) + 1
-        new_index.insert(new_index.index(selected_idx[-1])+1, next_id)
-        df = db.current_table.df = df.loc[new_index]
-        df.loc[:, '?'] = False
-        df.loc[next_id, '?'] = True
+        new_idx = table.insert_new_rows(insert_count, after=selected_idx[-1])
+        table.select(new_idx)
+    else:
+        table.insert_new_rows(insert_count)
 # delete row
-if sub_cols[1].button(tr.DeleteRow) and db.current_table:
-    save_draft_df()
-    df = db.current_table.df
+delete_clicked = sub_cols[1].button(tr.DeleteRow)
+cascade = sub_cols[1].checkbox(tr.CascadeDelete)
+if delete_clicked and current_table:
+    save_draft()
+    df = current_table.df
     selected_idx = df.index[df['?'] == True]
     if len(selected_idx) > 0:
-        df.drop(selected_idx, inplace=True)
+        ok, referrers = db.delete_rows(current_table.name, selected_idx, cascade)
+        if not ok:
+            st.error(tr.DeleteBlocked.format(len(referrers)))
+            for cell in referrers[:MAX_SHOWN_ERRORS]:
+                st.error(tr.ReferencedBy.format(*cell))
+            if len(referrers) > MAX_SHOWN_ERRORS:
+                st.error(tr.MoreErrors.format(len(referrers) - MAX_SHOWN_ERRORS))
 
 # copy dbref
-if sub_cols[2].button(tr.CopyDBRef) and db.current_table:
-    save_draft_df()
-    df = db.current_table.df
+if sub_cols[2].button(tr.CopyDBRef) and current_table:
+    save_draft()
+    df = current_table.df
     selected_idx = df.index[df['?'] == True]
     if len(selected_idx) == 1:
-        st.session_state[COPY_REF_KEY] = f'^{db.current_table.name}:{selected_idx[-1]}'
+        st.session_state[COPY_REF_KEY] = f'^{current_table.name}:{selected_idx[-1]}'
 
 if COPY_REF_KEY in st.session_state:
     st.code(st.session_state[COPY_REF_KEY], language='text')
@@ -108,36 +218,68 @@ if sub_cols[4].button(tr.ImportDB):
     st.session_state[IMPORT_DB_KEY] = db
 
 if IMPORT_DB_KEY in st.session_state:
-    uploaded_file = st.file_uploader(tr.ChooseFile, type="py")
+    uploaded_file = st.file_uploader(tr.ChooseFile, type=["py", "cs"])
     if uploaded_file is not None:
-        db_src = uploaded_file.getvalue().decode()
-        metadata, *src = db_src.split('\n')
-        if metadata.startswith('# '):
-            metadata = metadata[2:]
-        elif metadata.startswith('// '):
-            metadata = metadata[3:]
-        else:
+        try:
+            new_db: Database = read_header(uploaded_file)
+        except ValueError:
             st.error(tr.InvalidImportMetadata)
-            metadata = None
-        if metadata:
-            new_db: Database = pkl.loads(base64.b64decode(metadata))
+            new_db = None
+        if new_db is not None:
+            if STORE_PATH:
+                open_store(STORE_PATH).reset(new_db)
+            # every session switches to the imported database
+            shared['db'], shared['history'] = new_db, History(new_db, HISTORY_BUDGET)
             st.session_state.clear()
-            st.session_state[DB_KEY] = new_db
             st.rerun()
 
-if sub_cols[5].button(tr.ExportDB):
-    save_draft_df()
-    ok, error = db.check_integrity()
+export_clicked = sub_cols[5].button(tr.ExportDB)
+link_refs = sub_cols[5].checkbox(tr.LinkRefs, help=tr.LinkRefsHelp)
+pool_strings = sub_cols[5].checkbox(tr.PoolStrings, help=tr.PoolStringsHelp)
+if export_clicked:
+    save_draft()
+    ok, errors = db.check_integrity()
     if not ok:
-        st.error(tr.InvalidDBRef.format(*error))
+        for error in errors[:MAX_SHOWN_ERRORS]:
+            st.error(tr.InvalidDBRef.format(*error))
+        if len(errors) > MAX_SHOWN_ERRORS:
+            st.error(tr.MoreErrors.format(len(errors) - MAX_SHOWN_ERRORS))
     else:
-        python_data = export_python(db)
-        size_in_kb = int(len(python_data) / 1024)
-        st.download_button(label=f"Download Python ({size_in_kb} KB)", data=python_data, file_name='db.py')
+        ok, errors = db.check_constraints()
+        for error in errors[:MAX_SHOWN_ERRORS]:
+            st.error(tr.ConstraintViolation.format(*error))
+        if len(errors) > MAX_SHOWN_ERRORS:
+            st.error(tr.MoreErrors.format(len(errors) - MAX_SHOWN_ERRORS))
 
-        csharp_data = export_csharp(db)
-        size_in_kb = int(len(csharp_data) / 1024)
-        st.download_button(label=f"Download CSharp ({size_in_kb} KB)", data=csharp_data, file_name='db.cs')
+    if ok:
+        # download_button reads the files right away, so they can be closed after it
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as python_file:
+            python_size = export_python_to(db, python_file, link=link_refs, pool=pool_strings)
+            size_in_kb = int(python_file.tell() / 1024)
+            python_file.seek(0)
+            st.download_button(label=f"Download Python ({size_in_kb} KB)", data=python_file, file_name='db.py')
+
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as csharp_file:
+            csharp_size = export_csharp_to(db, csharp_file, link=link_refs, pool=pool_strings)
+            size_in_kb = int(csharp_file.tell() / 1024)
+            csharp_file.seek(0)
+            st.download_button(label=f"Download CSharp ({size_in_kb} KB)", data=csharp_file, file_name='db.cs')
+
+        with tempfile.TemporaryFile('w+b', buffering=0) as binary_file, tempfile.TemporaryFile('w+', encoding='utf-8') as loader_file:
+            export_binary_to(db, binary_file)
+            size_in_kb = int(binary_file.tell() / 1024)
+            binary_file.seek(0)
+            export_python_to(db, loader_file, data_file='db.bin', lazy=True, link=link_refs)
+            loader_file.seek(0)
+            st.download_button(label=f"Download Binary ({size_in_kb} KB)", data=binary_file, file_name='db.bin')
+            st.download_button(label=f"Download Python loader for db.bin", data=loader_file, file_name='db.py')
+        st.caption(tr.ExportCacheInfo.format(**EXPORT_CACHE.info()))
+        if pool_strings:
+            reports = {'Python': (python_size, python_pool_report(db)), 'CSharp': (csharp_size, csharp_pool_report(db))}
+            for language, (size, report) in reports.items():
+                saved = report['saved']
+                st.caption(tr.StringPoolInfo.format(language, report['strings'], report['references'], saved // 1024,
+                                                    100 * saved / max(1, size + saved)))
 
         # st.code(csharp_data, language='csharp')
 
@@ -153,42 +295,196 @@ if _0.button(tr.CreateColumn):
         if not col_name.isidentifier():
             sidebar.error(tr.InvalidName)
         else:
-            save_draft_df()
-            df = db.current_table.df
+            save_draft()
+            df = current_table.df
             if col_name in df.columns:
                 sidebar.error(tr.ColumnExists.format(col_name))
             else:
-                col_type = COLUMN_TYPES[col_type_name]
-                df[col_name] = [col_type.default] * len(df)
-                df[col_name] = df[col_name].astype(col_type.dtype)
-                db.current_table.column_types[col_name] = col_type_name
+                current_table.add_column(col_name, col_type_name)
 
 if _1.button(tr.DeleteColumn):
-    save_draft_df()
-    df = db.current_table.df
+    save_draft()
+    df = current_table.df
     if col_name and col_name in df.columns:
-        df.drop(col_name, axis=1, inplace=True)
-        db.current_table.column_types.pop(col_name)
+        current_table.drop_column(col_name)
+
+# column constraints, e.g. {"min": 0, "unique": true}
+constraint_cols = [] if current_table is None else [col for col in current_table.column_types if col != '?']
+if constraint_cols:
+    sidebar.subheader(tr.Constraints)
+    constraint_col = sidebar.selectbox("##Constraint column", constraint_cols, label_visibility="collapsed")
+    rules_text = sidebar.text_input("##Rules", json.dumps(current_table.constraints.get(constraint_col, {})),
+                                    key=f'constraints/{current_table.name}/{constraint_col}',
+                                    help=tr.ConstraintsHelp.format(', '.join(current_table.get_column_type(constraint_col).rules)))
+    if sidebar.button(tr.ApplyConstraints):
+        save_draft()
+        try:
+            current_table.set_constraints(constraint_col, json.loads(rules_text or '{}'))
+        except (json.JSONDecodeError, ValueError) as e:
+            sidebar.error(tr.InvalidConstraints.format(e))
+
+# import rows
+sidebar.subheader(tr.ImportRows)
+rows_file = sidebar.file_uploader(tr.ChooseFile, type=['csv', 'json', 'jsonl', 'xlsx', 'xls'], key='import_rows_file')
+if sidebar.button(tr.ImportRows) and rows_file is not None:
+    save_draft()
+    table_name = current_table.name if current_table else os.path.splitext(rows_file.name)[0]
+    try:
+        rows_df = read_frame(rows_file, rows_file.name)
+        if not table_name.isidentifier():
+            raise ValueError(table_name)
+    except (ValueError, ImportError) as e:
+        sidebar.error(tr.InvalidImportFile.format(e))
+    else:
+        if table_name not in db.tables:
+            db.create_table(table_name)
+            current_table = set_current_table(table_name)
+        try:
+            ids, errors = import_rows(db.tables[table_name], rows_df)
+        except ValueError as e:
+            sidebar.error(tr.InvalidImportFile.format(e))
+        else:
+            sidebar.success(tr.ImportedRows.format(len(ids), table_name))
+            for error in errors[:MAX_SHOWN_ERRORS]:
+                sidebar.warning(tr.InvalidDBRef.format(*error))
+            if len(errors) > MAX_SHOWN_ERRORS:
+                sidebar.warning(tr.MoreErrors.format(len(errors) - MAX_SHOWN_ERRORS))
 
-if db.current_table is None:
+# undo history
+sidebar.subheader(tr.History)
+_0, _1 = sidebar.columns(2)
+undo_clicked = _0.button(tr.Undo, disabled=not history.can_undo(), use_container_width=True)
+redo_clicked = _1.button(tr.Redo, disabled=not history.can_redo(), use_container_width=True)
+_0, _1 = sidebar.columns(2)
+checkpoint_name = _0.text_input("Checkpoint name", label_visibility="collapsed")
+checkpoint_clicked = _1.button(tr.Checkpoint)
+restore_clicked = False
+if history.checkpoints:
+    _0, _1 = sidebar.columns(2)
+    restore_name = _0.selectbox("Checkpoint", list(history.checkpoints), label_visibility="collapsed")
+    restore_clicked = _1.button(tr.RestoreCheckpoint)
+if undo_clicked or redo_clicked or restore_clicked or (checkpoint_clicked and checkpoint_name):
+    save_draft()
+    if undo_clicked:
+        history.undo()
+    elif redo_clicked:
+        history.redo()
+    elif restore_clicked:
+        history.restore(restore_name)
+    else:
+        history.checkpoint(checkpoint_name)
+    st.session_state[EDITOR_VERSION_KEY] = st.session_state.get(EDITOR_VERSION_KEY, 0) + 1
+    st.rerun()
+sidebar.caption(tr.HistoryInfo.format(len(history.versions), history.memory_usage() // 1024))
+if history.can_undo() and sidebar.toggle(tr.ShowChanges):
+    changes = diff(history.versions[history.cursor - 1], history.head)
+    sidebar.dataframe(pd.DataFrame(changes).map(lambda v: len(v) if isinstance(v, (list, dict)) else v), hide_index=True)
+
+# profiling, its results are filled in at the end of the run
+sidebar.toggle(tr.Profiling, key='profiling')
+profile_panel = sidebar.container()
+
+if current_table is None:
     st.info(tr.WelcomeMessage)
     st.stop()
 
-df: pd.DataFrame = db.current_table.df
+table = current_table
+# the table changed under pending edits, apply them to the rows they were made on before the window is fetched again
+draft = st.session_state.get(DRAFT_KEY)
+if draft is not None and draft[0] == table.name and draft[3] != table.version:
+    save_draft()
+df: pd.DataFrame = table.df
+
+# only one window of the table is sent to the editor; changing the window saves pending edits first
+view_key = f'view/{table.name}'
+view_cols = st.columns([1, 1.5, 1, 1.5, 2, 1])
+page_size = view_cols[0].selectbox(tr.PageSize, PAGE_SIZES, index=1, key=f'{view_key}/page_size', on_change=view_changed)
+col_names = [col for col in df.columns if col != '?']
+sort_by = view_cols[1].selectbox(tr.SortBy, [None, *col_names], key=f'{view_key}/sort_by', on_change=view_changed)
+descending = view_cols[2].checkbox(tr.Descending, key=f'{view_key}/descending', on_change=view_changed)
+filter_col = view_cols[3].selectbox(tr.FilterColumn, [None, *col_names], key=f'{view_key}/filter_col', on_change=view_changed)
+filter_text = view_cols[4].text_input(tr.Filter, key=f'{view_key}/filter', on_change=view_changed)
+query_text = st.text_input(tr.Query, key=f'{view_key}/query', placeholder='{"hp": {"$gte": 10}, "name": {"$regex": "^a"}}',
+                           on_change=view_changed)
+
+def filter_ids() -> tuple[pd.Index | None, Exception | None]:
+    view_ids = table.contains(filter_col, filter_text) if filter_col and filter_text else None
+    if query_text.strip():
+        try:
+            query_ids = table.match(json.loads(query_text))
+        except (json.JSONDecodeError, QueryError) as e:
+            return view_ids, e
+        view_ids = query_ids if view_ids is None else query_ids[query_ids.isin(view_ids)]
+    return view_ids, None
+
+# rows are fetched again only when the table changed, in this session or another one
+view_ids, query_error = cached(VIEW_CACHE_KEY, (table, table.version, filter_col, filter_text, query_text), filter_ids)
+if query_error is not None:
+    st.error(tr.InvalidQuery.format(query_error))
+total = len(df) if view_ids is None else len(view_ids)
+num_pages = max(1, (total + page_size - 1) // page_size)
+page_key = f'{view_key}/page'
+if st.session_state.get(page_key, 1) > num_pages:
+    st.session_state[page_key] = num_pages
+page = view_cols[5].number_input(tr.Page, min_value=1, max_value=num_pages, key=page_key, on_change=view_changed)
+offset = (page - 1) * page_size
+page_df = cached(PAGE_CACHE_KEY, (table, table.version, offset, page_size, sort_by, descending, filter_col, filter_text, query_text),
+                 lambda: table.page(offset, page_size, sort_by, not descending, view_ids))
+if CONFLICT_KEY in st.session_state:
+    st.warning(tr.EditConflict.format(st.session_state.pop(CONFLICT_KEY)))
+if REJECTED_KEY in st.session_state:
+    rejected = st.session_state.pop(REJECTED_KEY)
+    st.warning(tr.RejectedCells.format(len(rejected), ', '.join(f'{row}.{col} = {value!r}' for row, col, value in rejected[:MAX_SHOWN_ERRORS])))
+st.caption(tr.RowsShown.format(offset + 1 if len(page_df) else 0, offset + len(page_df), total))
 
 column_config = {"": st.column_config.TextColumn("id", disabled=True)}
 for col_name in df.columns:
-    col_type = db.current_table.get_column_type(col_name)
+    col_type = table.get_column_type(col_name)
     if col_type.name == 'dbref':
         col_label = f"{col_name} ({col_type.name})"
     else:
         col_label = col_name
     column_config[col_name] = col_type.get_config(col_label)
 
-st.session_state[DRAFT_DF_KEY] = st.data_editor(
-    df,
-    column_config=column_config,
-    key='current_table',
-    # height=int((len(df)+1) * 35.0 + 5.0),
-    # height=int((min(14, len(df))+1) * 35.0 + 5.0),
-)
\ No newline at end of file
+# rows breaking a column constraint are flagged in a read-only column, data_editor only styles disabled cells
+if table.constraints:
+    broken = db.validator.describe(table.name, page_df.index)
+    violation_count = len(db.validator.violations(table.name))
+    if violation_count:
+        st.caption(tr.ConstraintCount.format(violation_count))
+        page_df = page_df.assign(**{VIOLATION_COLUMN: broken})
+        column_config[VIOLATION_COLUMN] = st.column_config.TextColumn(VIOLATION_COLUMN, disabled=True)
+
+editor_version = st.session_state.get(EDITOR_VERSION_KEY, 0)
+editor_key = f'editor/{table.name}/{editor_version}/{page_size}/{offset}/{sort_by}/{descending}/{filter_col}/{filter_text}/{query_text}'
+st.session_state[DRAFT_KEY] = (table.name, editor_key, page_df.index, table.version)
+with PROFILER.phase('data_editor', table.name):
+    st.data_editor(
+        page_df,
+        column_config=column_config,
+        key=editor_key,
+        # height=int((len(df)+1) * 35.0 + 5.0),
+        # height=int((min(14, len(df))+1) * 35.0 + 5.0),
+    )
+
+selected_idx = df.index[df['?'] == True]
+if len(selected_idx) > 0:
+    referrers = db.referrers(table.name, selected_idx)
+    if referrers:
+        st.caption(tr.ReferencedByCount.format(len(referrers)))
+        st.dataframe(pd.DataFrame(referrers), hide_index=True)
+
+if st.toggle(tr.MemoryReport):
+    report = table.memory_report()
+    st.dataframe(report)
+    st.caption(tr.MemoryTotal.format(report['bytes'].sum() // 1024, report['plain_bytes'].sum() // 1024))
+
+if PROFILER.enabled:
+    PROFILER.record('rerun', time.perf_counter() - rerun_start)
+    profile_panel.dataframe(pd.DataFrame(PROFILER.stats()), hide_index=True)
+    profile_log = io.StringIO()
+    PROFILER.dump(profile_log)
+    _0, _1 = profile_panel.columns(2)
+    _0.download_button(tr.DownloadProfile, profile_log.getvalue(), file_name='profile.jsonl')
+    if _1.button(tr.ClearProfile):
+        PROFILER.clear()
\ No newline at end of file
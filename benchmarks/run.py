@@ -0,0 +1,113 @@
+import argparse
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from tinymongo.exporters.binary import export_to as export_binary_to
+from tinymongo.exporters.cache import ExportCache
+from tinymongo.exporters.csharp import export_to as export_csharp_to
+from tinymongo.exporters.python import export_to as export_python_to
+from tinymongo.snapshot import read_header
+
+from benchmarks.synthetic import make_database
+
+def best_of(repeat: int, fn: Callable) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def load_module(path: str):
+    spec = importlib.util.spec_from_file_location('tinymongo_bench_db', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args) -> dict:
+    results = {}
+    start = time.perf_counter()
+    db = make_database(args.tables, args.rows, dbref_density=args.dbref_density, seed=args.seed)
+    results['generate'] = time.perf_counter() - start
+
+    results['check_integrity'] = best_of(args.repeat, db.check_integrity)
+    # a fresh cache each time, so the exporters do the full work
+    results['export_python'] = best_of(args.repeat, lambda: export_python_to(db, io.StringIO(), cache=ExportCache()))
+    results['export_csharp'] = best_of(args.repeat, lambda: export_csharp_to(db, io.StringIO(), cache=ExportCache()))
+    results['export_binary'] = best_of(args.repeat, lambda: export_binary_to(db, io.BytesIO()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench_db.py')
+        with open(path, 'w', encoding='utf-8') as f:
+            export_python_to(db, f, cache=ExportCache())
+        results['python_size'] = os.path.getsize(path)
+        results['python_size_pooled'] = export_python_to(db, io.StringIO(), pool=True, cache=ExportCache())
+
+        def read_metadata():
+            with open(path, 'rb') as f:
+                read_header(f)
+        results['read_header'] = best_of(args.repeat, read_metadata)
+        results['import_module'] = best_of(args.repeat, lambda: load_module(path))
+
+        module = load_module(path)
+        table = module.db.table0
+        results['objects_first'] = best_of(1, lambda: table.objects(str0='kind1'))
+        results['objects_eq'] = best_of(args.repeat, lambda: [table.objects(str0=f'kind{i}') for i in range(100)])
+        results['objects_range'] = best_of(args.repeat, lambda: [table.objects(int0__gte=i, int0__lt=i + 100) for i in range(0, 10000, 100)])
+        results['dereference'] = best_of(args.repeat, lambda: [row.dbref0 for row in table.data])
+    return results
+
+def compare(results: dict, baseline: dict):
+    print(f'{"benchmark":<20}{"baseline":>12}{"current":>12}{"ratio":>8}')
+    for name, value in results.items():
+        old = baseline['results'].get(name)
+        old_str = f'{old:.6g}' if old is not None else '-'
+        ratio = f'{value / old:.2f}' if old else '-'
+        print(f'{name:<20}{old_str:>12}{value:>12.6g}{ratio:>8}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the database, exporters and generated Python module on a synthetic database.')
+    parser.add_argument('--tables', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--dbref-density', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', help='a previous output file to compare against')
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+    else:
+        for name, value in results.items():
+            print(f'{name:<20}{value:>12.6g}')
+
+if __name__ == '__main__':
+    main()
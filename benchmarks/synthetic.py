@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from tinymongo.db import Database
+
+DEFAULT_COLUMNS = {'str': 2, 'int': 2, 'float': 1, 'bool': 1, 'dbref': 2}
+ENUM_SIZE = 50
+
+def make_database(tables: int = 5, rows: int = 10000, columns: dict[str, int] | None = None,
+                  dbref_density: float = 0.5, seed: int = 0) -> Database:
+    # a reproducible database of `tables` tables with `rows` rows each;
+    # half of the str columns are enum-like, dbref cells point at random rows with probability `dbref_density`
+    columns = DEFAULT_COLUMNS if columns is None else columns
+    rng = np.random.default_rng(seed)
+    db = Database('bench')
+    names = [f'table{i}' for i in range(tables)]
+    for name in names:
+        table = db.create_table(name)
+        for col_type_name, count in columns.items():
+            for i in range(count):
+                table.add_column(f'{col_type_name}{i}', col_type_name)
+
+    for name in names:
+        table = db.tables[name]
+        new_rows = table.new_rows(rows)
+        for col, col_type_name in table.column_types.items():
+            if col_type_name == 'int':
+                new_rows[col] = rng.integers(-10000, 10000, rows)
+            elif col_type_name == 'float':
+                new_rows[col] = rng.random(rows) * 100
+            elif col_type_name == 'bool' and col != '?':
+                new_rows[col] = rng.random(rows) < 0.5
+            elif col_type_name == 'str':
+                if int(col.removeprefix('str')) % 2 == 0:
+                    values = [f'kind{i}' for i in rng.integers(0, ENUM_SIZE, rows)]
+                else:
+                    values = [f'{name}_{col}_{i}' for i in range(rows)]
+                new_rows[col] = pd.Series(values, index=new_rows.index, dtype=object)
+            elif col_type_name == 'dbref':
+                targets = rng.integers(0, tables, rows)
+                ids = rng.integers(0, rows, rows) + 1001      # new tables hand out ids from 1001
+                linked = rng.random(rows) < dbref_density
+                values = [f'^{names[t]}:{i}' if link else '' for t, i, link in zip(targets, ids, linked)]
+                new_rows[col] = pd.Series(values, index=new_rows.index, dtype=object)
+        table.insert_rows(new_rows)
+    return db
@@ -0,0 +1,52 @@
+import pytest
+
+from tinymongo.db import Database
+
+
+def fill_db(db: Database) -> Database:
+    # two tables of every column type, with dbrefs between them and repeated strings
+    item = db.create_table('item')
+    for col, col_type_name in [('name', 'str'), ('hp', 'int'), ('weight', 'float'), ('rare', 'bool'), ('parent', 'dbref')]:
+        item.add_column(col, col_type_name)
+    ids = item.insert_new_rows(6)
+    item.update_cells(ids, ['name', 'hp', 'weight', 'rare', 'parent'], [
+        ['sword', 'axe', 'bow', 'sword', '剑 of fire', ''],
+        [10, -3, 250, 10, 0, 70000],
+        [1.5, 0.25, -2.0, 1.5, 0.0, 3.75],
+        [True, False, False, True, False, True],
+        ['', f'^item:{ids[0]}', f'^item:{ids[0]}', '', f'^item:{ids[1]}', ''],
+    ])
+    npc = db.create_table('npc')
+    npc.add_column('title', 'str')
+    npc.add_column('weapon', 'dbref')
+    npc_ids = npc.insert_new_rows(4)
+    npc.update_cells(npc_ids, ['title', 'weapon'], [['guard', 'guard', 'guard', 'king'],
+                                                    [f'^item:{ids[0]}', f'^item:{ids[2]}', f'^item:{ids[2]}', '']])
+    item.set_constraints('hp', {'min': -10, 'max': 100000})
+    npc.set_constraints('weapon', {'target': 'item'})
+    return db
+
+
+def assert_same_db(actual: Database, expected: Database):
+    assert list(actual.tables) == list(expected.tables)
+    for name, table in expected.tables.items():
+        other = actual.tables[name]
+        assert other.column_types == table.column_types
+        assert other._next_id == table._next_id
+        assert other.constraints == table.constraints
+        assert other.df.astype(other.dtypes()).equals(table.df.astype(table.dtypes())), name
+
+
+@pytest.fixture
+def db() -> Database:
+    return fill_db(Database('db'))
+
+
+@pytest.fixture
+def fill():
+    return fill_db
+
+
+@pytest.fixture
+def same_db():
+    return assert_same_db
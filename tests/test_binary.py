@@ -0,0 +1,77 @@
+import io
+import struct
+
+import pytest
+
+from tinymongo import snapshot
+from tinymongo.db import Database
+from tinymongo.exporters import binary
+from tinymongo.exporters.binary_reader import BINARY_ALIGNMENT, BINARY_MAGIC, BinaryReader
+
+
+def test_reader_sees_exported_columns(db):
+    reader = BinaryReader(binary.export(db))
+    assert reader.name == 'db'
+    item = reader.tables['item']
+    table = db.tables['item']
+    assert len(item) == len(table.df)
+    assert list(item.ids) == table.df.index.tolist()
+    for col in ['name', 'hp', 'weight', 'rare', 'parent']:
+        assert list(item.column(col)) == table.df[col].tolist(), col
+    assert item.constraints == {'hp': {'min': -10, 'max': 100000}}
+
+
+def test_sections_are_aligned(db):
+    data = binary.export(db)
+    assert data[:4] == BINARY_MAGIC and data[-4:] == BINARY_MAGIC
+    reader = BinaryReader(data)
+    for table in reader.tables.values():
+        assert table._ids % BINARY_ALIGNMENT == 0
+        assert all(col['offset'] % BINARY_ALIGNMENT == 0 for col in table._columns.values())
+
+
+def test_export_to_matches_export(db):
+    buffer = io.BytesIO()
+    assert binary.export_to(db, buffer) == len(buffer.getvalue())
+    assert buffer.getvalue() == binary.export(db)
+
+
+def test_round_trip(db, same_db):
+    same_db(snapshot.from_binary(BinaryReader(binary.export(db))), db)
+
+
+def test_round_trip_through_file(db, same_db, tmp_path):
+    path = tmp_path / 'db.bin'
+    path.write_bytes(binary.export(db))
+    same_db(snapshot.read_binary(str(path)), db)
+
+
+def test_empty_database():
+    reader = BinaryReader(binary.export(Database('empty')))
+    assert reader.tables == {}
+    assert reader.string_count == 1      # the empty string is always there
+
+
+def test_strings_are_shared(db):
+    reader = BinaryReader(binary.export(db))
+    strings = [reader.string(i) for i in range(reader.string_count)]
+    assert len(strings) == len(set(strings))
+    assert 'sword' in strings and '剑 of fire' in strings
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'TMDB',
+    b'XXXX' + bytes(40),
+    struct.pack('<4sI', BINARY_MAGIC, 99) + bytes(16) + BINARY_MAGIC,
+])
+def test_damaged_data_is_value_error(data):
+    with pytest.raises(ValueError):
+        snapshot.read_binary(data)
+
+
+def test_truncated_exports_are_value_errors(db):
+    data = binary.export(db)
+    for end in range(0, len(data), 5):
+        with pytest.raises(ValueError):
+            snapshot.read_binary(data[:end])
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from tinymongo import snapshot
+from tinymongo.cli import load_database, main
+from tinymongo.exporters import binary, python
+from tinymongo.storage import Store
+
+
+@pytest.fixture
+def valid_db(db):
+    # the fixture leaves some dbrefs empty, which the integrity check reports
+    for table in db.tables.values():
+        for col in table.dbref_columns():
+            empty = table.df.index[table.df[col] == '']
+            table.update_cells(empty, [col], [[f'^item:{db.tables["item"].df.index[0]}'] * len(empty)])
+    assert db.check_integrity()[0]
+    return db
+
+
+def write_sources(db, directory) -> list[str]:
+    os.makedirs(directory, exist_ok=True)
+    py = os.path.join(directory, 'game.py')
+    with open(py, 'w', encoding='utf-8') as f:
+        python.export_to(db, f)
+    bin_ = os.path.join(directory, 'game.bin')
+    with open(bin_, 'wb') as f:
+        binary.export_to(db, f)
+    store = Store(os.path.join(directory, 'store'))
+    store.reset(db)
+    store.close()
+    return [py, bin_, os.path.join(directory, 'store')]
+
+
+def test_every_source_kind_loads(valid_db, same_db, tmp_path):
+    for source in write_sources(valid_db, tmp_path):
+        same_db(load_database(source), valid_db)
+
+
+def test_export_all_formats(valid_db, same_db, tmp_path, capsys):
+    source = write_sources(valid_db, tmp_path / 'in')[1]
+    out = tmp_path / 'out'
+    assert main([source, '-f', 'python', 'csharp', 'binary', '-o', str(out), '-j', '1']) == 0
+    assert sorted(os.listdir(out)) == ['game.bin', 'game.cs', 'game.py']
+    same_db(snapshot.read_binary(str(out / 'game.bin')), valid_db)
+    same_db(load_database(str(out / 'game.py')), valid_db)
+    assert capsys.readouterr().out.count(' -> ') == 3
+
+
+def test_colliding_names_get_suffixes(valid_db, tmp_path):
+    # the first source takes a name that the suffixes would produce
+    taken = tmp_path / 'game_1.py'
+    os.rename(write_sources(valid_db, tmp_path / 'x')[0], taken)
+    sources = [str(taken), *(write_sources(valid_db, tmp_path / directory)[0] for directory in ('a', 'b', 'c'))]
+    out = tmp_path / 'out'
+    assert main([*sources, '-f', 'python', '-o', str(out), '-j', '2']) == 0
+    assert sorted(os.listdir(out)) == ['game.py', 'game_1.py', 'game_2.py', 'game_3.py']
+    assert main([sources[1], sources[1], '-f', 'python', '-o', str(out), '-j', '2']) == 0
+
+
+def test_source_is_not_overwritten(valid_db, tmp_path):
+    source = write_sources(valid_db, tmp_path)[0]
+    before = open(source, encoding='utf-8').read()
+    assert main([source, '-f', 'python', '-o', str(tmp_path), '-j', '1']) == 0
+    assert open(source, encoding='utf-8').read() == before
+    assert os.path.exists(tmp_path / 'game.out.py')
+
+
+def test_broken_dbrefs_fail_the_source(db, tmp_path, capsys):
+    source = write_sources(db, tmp_path / 'in')[1]
+    out = tmp_path / 'out'
+    assert main([source, '-f', 'python', 'csharp', '-o', str(out), '-j', '1']) == 1
+    assert os.listdir(out) == []
+    err = capsys.readouterr().err
+    assert "'' is not a valid dbref in item.parent" in err
+    assert err.count("in item.parent, row") == 3      # reported once, not once per format
+    assert main([source, '--no-check', '-f', 'python', '-o', str(out), '-j', '1']) == 0
+
+
+@pytest.mark.parametrize('content', [b'', b'TMDB garbage', b'# not a header\n', b'\x00' * 100])
+def test_unreadable_source(valid_db, tmp_path, capsys, content):
+    bad = tmp_path / 'bad.py'
+    bad.write_bytes(content)
+    good = write_sources(valid_db, tmp_path / 'in')[1]
+    out = tmp_path / 'out'
+    assert main([str(bad), good, '-f', 'python', '-o', str(out), '-j', '1']) == 1
+    assert os.listdir(out) == ['game.py']
+    assert capsys.readouterr().err.startswith(f'{bad}: ')
+
+
+def test_missing_source(tmp_path, capsys):
+    assert main([str(tmp_path / 'nothing.bin'), '-o', str(tmp_path), '-j', '1']) == 1
+    assert 'nothing.bin' in capsys.readouterr().err
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from tinymongo.columns import COLUMN_TYPES
+
+
+@pytest.mark.parametrize('values, dtype', [
+    ([1, -3, 100], 'int8'),
+    ([1, 300], 'int16'),
+    ([1, 70000], 'int32'),
+    ([1, 2 ** 40], 'int64'),
+    ([], 'int64'),
+])
+def test_ints_take_the_narrowest_dtype(values, dtype):
+    assert COLUMN_TYPES['int'].compact(pd.Series(values, dtype='int64')).dtype == dtype
+
+
+def test_repeated_strings_become_categories():
+    values = pd.Series(['a', 'a', 'a', 'b', ''], dtype=object)
+    compact = COLUMN_TYPES['str'].compact(values)
+    assert compact.dtype == 'category' and compact.cat.categories.dtype == object
+    assert compact.tolist() == values.tolist()
+
+
+@pytest.mark.parametrize('values', [['a', 'b', 'c', 'd'], ['', '', '', ''], []])
+def test_distinct_or_empty_strings_stay_plain(values):
+    assert COLUMN_TYPES['str'].compact(pd.Series(values, dtype=object)).dtype == object
+
+
+def test_new_rows_do_not_categorize(db):
+    item = db.tables['item']
+    item.add_column('note', 'str')
+    item.insert_new_rows(20)
+    assert item.df['note'].dtype == object
+
+
+def test_widened_int_column(db):
+    item = db.tables['item']
+    assert item.df['hp'].dtype == 'int64'      # 70000 was stored through a narrower column
+    item.compact()
+    assert item.df['hp'].dtype == 'int32'
+    item.update_cells(item.df.index[:1], ['hp'], [[2 ** 40]])
+    assert item.df['hp'].dtype == 'int64' and item.df['hp'].iloc[0] == 2 ** 40
+
+
+def test_updates_drop_unused_categories(db):
+    npc = db.tables['npc']
+    assert list(npc.df['title'].cat.categories) == ['guard', 'king']
+    npc.update_cells(npc.df.index[3:], ['title'], [['guard']])
+    assert list(npc.df['title'].cat.categories) == ['guard']
+    npc.update_cells(npc.df.index[:1], ['title'], [['queen']])
+    assert set(npc.df['title'].cat.categories) == {'guard', 'queen'}
+
+
+def test_distinct_updates_leave_categories(db):
+    npc = db.tables['npc']
+    npc.update_cells(npc.df.index, ['title'], [['a', 'b', 'c', 'd']])
+    assert npc.df['title'].dtype == object
+
+
+def test_deletes_drop_unused_categories(db):
+    npc = db.tables['npc']
+    npc.insert_new_rows(2)
+    npc.update_cells(npc.df.index[-2:], ['title'], [['guard', 'guard']])
+    db.delete_rows('npc', npc.df.index[3:4])
+    assert list(npc.df['title'].cat.categories) == ['guard']
+
+
+def test_plain_values_are_unchanged(db):
+    for table in db.tables.values():
+        before = table.df.astype(table.dtypes())
+        table.compact()
+        assert table.df.astype(table.dtypes()).equals(before)
+        report = table.memory_report()
+        assert report.loc[list(table.df.columns), 'bytes'].sum() <= report.loc[list(table.df.columns), 'plain_bytes'].sum()
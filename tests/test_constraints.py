@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+from tinymongo.constraints import ConstraintError, Validator, enforce, validate_rules
+
+
+@pytest.fixture
+def constrained(db):
+    item, npc = db.tables['item'], db.tables['npc']
+    item.set_constraints('name', {'non_empty': True, 'unique': True, 'regex': r'^\w'})
+    item.set_constraints('hp', {'min': 0, 'max': 1000})
+    item.set_constraints('weight', {'allowed': [0.0, 1.5, 3.75]})
+    npc.set_constraints('title', {'allowed': ['guard', 'king', 'queen']})
+    return db
+
+
+def rules_broken(db):
+    return {(v.table, v.column, v.row, v.rule) for v in db.validator.violations()}
+
+
+def assert_matches_full_check(db):
+    fresh = Validator(db)
+    assert db.validator.violations() == fresh.violations()
+
+
+def test_violations(constrained):
+    ids = constrained.tables['item'].df.index
+    # '剑 of fire' starts with a word character; the empty npc weapon is no broken target
+    assert rules_broken(constrained) == {
+        ('item', 'name', ids[0], 'unique'), ('item', 'name', ids[3], 'unique'),
+        ('item', 'name', ids[5], 'non_empty'), ('item', 'name', ids[5], 'regex'),
+        ('item', 'hp', ids[1], 'min'), ('item', 'hp', ids[5], 'max'),
+        ('item', 'weight', ids[1], 'allowed'), ('item', 'weight', ids[2], 'allowed'),
+    }
+    assert constrained.check_constraints()[0] is False
+
+
+def test_incremental_check_matches_full_check(constrained):
+    rng = random.Random(5)
+    item, npc = constrained.tables['item'], constrained.tables['npc']
+    constrained.validator.violations()
+    for step in range(60):
+        ids = item.df.index.tolist()
+        action = rng.randrange(7)
+        if action == 0:
+            row = rng.sample(ids, 1)
+            item.update_cells(row, ['name', 'hp'], [[rng.choice(['sword', 'axe', '', '?x'])], [rng.randrange(-5, 1500)]])
+        elif action == 1:
+            item.insert_new_rows(rng.randrange(1, 3))
+        elif action == 2 and len(ids) > 2:
+            constrained.delete_rows('item', rng.sample(ids, 1), cascade=True)
+        elif action == 3:
+            npc.update_cells(npc.df.index[:1], ['weapon'], [[rng.choice([f'^item:{rng.choice(ids)}', '^item:1', ''])]])
+        elif action == 4:
+            item.set_constraints('hp', {'min': rng.randrange(0, 20), 'max': 1000})
+        elif action == 5:
+            constrained.reid_rows('item', ids[-1:], [max(ids) + 100])
+        else:
+            npc.update_cells(npc.df.index[-1:], ['title'], [[rng.choice(['king', 'jester'])]])
+        assert_matches_full_check(constrained)
+
+
+def test_renamed_target(constrained):
+    constrained.validator.violations()
+    before = rules_broken(constrained)
+    constrained.rename_table('item', 'gear')
+    assert_matches_full_check(constrained)
+    assert {(t, c, r, rule) for t, c, r, rule in rules_broken(constrained) if t == 'npc'} == \
+           {(t, c, r, rule) for t, c, r, rule in before if t == 'npc'}
+    constrained.drop_table('gear')
+    assert_matches_full_check(constrained)
+    assert {rule for _, _, _, rule in rules_broken(constrained)} == {'target'}
+
+
+def test_removing_rules(constrained):
+    item = constrained.tables['item']
+    for col in list(item.constraints):
+        item.set_constraints(col, {})
+    assert {table for table, *_ in rules_broken(constrained)} <= {'npc'}
+    constrained.tables['npc'].drop_column('weapon')
+    assert rules_broken(constrained) == set()
+    enforce(constrained)
+
+
+def test_enforce_and_describe(constrained):
+    with pytest.raises(ConstraintError) as e:
+        enforce(constrained)
+    assert e.value.violations == constrained.validator.violations()
+    ids = constrained.tables['item'].df.index
+    described = constrained.validator.describe('item', ids[:2])
+    assert described.tolist() == ['name: unique', 'hp: min, weight: allowed']
+
+
+@pytest.mark.parametrize('col_type_name, rules', [
+    ('int', {'regex': 'x'}),
+    ('str', {'min': 1}),
+    ('int', {'min': True}),
+    ('int', {'max': '5'}),
+    ('str', {'unique': 1}),
+    ('str', {'regex': '('}),
+    ('str', {'allowed': 'abc'}),
+    ('dbref', {'target': 3}),
+    ('bool', {'bogus': True}),
+])
+def test_invalid_rules(col_type_name, rules):
+    with pytest.raises(ValueError):
+        validate_rules(col_type_name, rules)
+
+
+def test_set_constraints_validates(db):
+    with pytest.raises(ValueError):
+        db.tables['item'].set_constraints('hp', {'min': 'low'})
+    assert db.tables['item'].constraints['hp'] == {'min': -10, 'max': 100000}
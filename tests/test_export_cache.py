@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+from tinymongo import snapshot
+from tinymongo.exporters import binary, csharp, python
+from tinymongo.exporters.binary_reader import BinaryReader
+from tinymongo.exporters.cache import ExportCache, table_digest
+
+GENERATED_ON = re.compile(r'Generated on [\d\- :]+')
+
+
+def undated(text: str) -> str:
+    return GENERATED_ON.sub('', text)
+
+
+@pytest.mark.parametrize('exporter', [python, csharp])
+def test_cached_export_is_unchanged(db, exporter):
+    cache = ExportCache()
+    first = exporter.export(db, cache=cache)
+    misses = cache.misses
+    second = exporter.export(db, cache=cache)
+    assert cache.misses == misses and cache.hits > 0
+    assert undated(first) == undated(second) == undated(exporter.export(db, cache=None))
+
+
+def test_changed_table_is_exported_again(db):
+    cache = ExportCache()
+    python.export(db, cache=cache)
+    db.tables['item'].update_cells(db.tables['item'].df.index[:1], ['name'], [['club']])
+    hits = cache.hits
+    text = python.export(db, cache=cache)
+    assert 'club' in text
+    assert cache.hits > hits        # the npc table is unchanged
+
+
+def test_digest_follows_content(db):
+    item = db.tables['item']
+    digest = table_digest(item)
+    item.update_cells(item.df.index[:1], ['hp'], [[11]])
+    assert table_digest(item) != digest
+    item.update_cells(item.df.index[:1], ['hp'], [[10]])
+    assert table_digest(item) == digest
+
+
+def test_round_trip_hits_the_cache(db):
+    loaded = snapshot.from_binary(BinaryReader(binary.export(db)))
+    for name, table in db.tables.items():
+        assert table_digest(loaded.tables[name]) == table_digest(table)
+
+
+def test_cache_is_bounded():
+    cache = ExportCache(max_size=10)
+    cache.put('a', 'x' * 6)
+    cache.put('b', 'y' * 6)
+    assert cache.get('a') is None and cache.get('b') == 'y' * 6
+    cache.put('c', 'z' * 11)
+    assert cache.get('c') is None
+    assert cache.size == 6
@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tinymongo.importers import coerce_column, import_rows, infer_column_type, read_frame
+
+CSV = '''?,id,name,hp,weight,rare,flag,parent,stock
+True,7,rope,1,0.5,yes,true,^item:1,3
+False,8,torch,2,1,no,false,,
+False,9,lamp,3,2.25,,FALSE,^item:1,5
+'''
+
+
+@pytest.mark.parametrize('values, col_type_name', [
+    (pd.Series([True, False]), 'bool'),
+    (pd.Series([1, 2]), 'int'),
+    (pd.Series([1.0, np.nan, 3.0]), 'int'),
+    (pd.Series([1.5, np.nan]), 'float'),
+    (pd.Series([np.nan, np.nan]), 'float'),
+    (pd.Series(['^item:1', None, '^npc:-2']), 'dbref'),
+    (pd.Series(['True', 'false', None]), 'bool'),
+    (pd.Series(['a', '^item:1']), 'str'),
+    (pd.Series([None, None], dtype=object), 'str'),
+])
+def test_infer_column_type(values, col_type_name):
+    assert infer_column_type(values) == col_type_name
+
+
+@pytest.mark.parametrize('values, col_type_name, expected', [
+    (pd.Series(['1', 'x', None]), 'int', [1, 0, 0]),
+    (pd.Series([1.5, None]), 'float', [1.5, 0.0]),
+    (pd.Series(['Yes', ' y ', 'no', None, '1']), 'bool', [True, True, False, False, True]),
+    (pd.Series([1.0, 0.0, np.nan]), 'bool', [True, False, False]),
+    (pd.Series(['a', None, 3]), 'str', ['a', '', '3']),
+])
+def test_coerce_column(values, col_type_name, expected):
+    assert coerce_column(values, col_type_name).tolist() == expected
+
+
+def test_import_csv(db):
+    item = db.tables['item']
+    count = len(item.df)
+    ids, violations = import_rows(item, read_frame(io.StringIO(CSV), 'items.csv'))
+    assert len(ids) == 3 and len(item.df) == count + 3
+    assert not set(ids) & {7, 8, 9}                         # rows get new ids
+    assert item.column_types['flag'] == 'bool' and item.column_types['stock'] == 'int'
+    assert 'id' not in item.column_types
+    rows = item.df.loc[ids]
+    assert rows['name'].tolist() == ['rope', 'torch', 'lamp']
+    assert rows['rare'].tolist() == [True, False, False]
+    assert rows['stock'].tolist() == [3, 0, 5]
+    assert rows['?'].tolist() == [False] * 3
+    # empty dbrefs are broken as well, as in check_integrity
+    assert [(v.row, v.value) for v in violations] == [(ids[0], '^item:1'), (ids[1], ''), (ids[2], '^item:1')]
+    assert {(v.table, v.column) for v in violations} == {('item', 'parent')}
+
+
+def test_import_refers_to_imported_rows(db):
+    npc = db.tables['npc']
+    next_id = npc._next_id + 1
+    frame = pd.DataFrame({'title': ['a', 'b'], 'weapon': [f'^npc:{next_id + 1}', f'^npc:{next_id}']})
+    _, violations = import_rows(npc, frame, {'weapon': 'dbref'})
+    assert violations == []
+
+
+def test_json_lines(db):
+    frame = read_frame(io.StringIO('{"name": "x", "hp": 4}\n{"name": "y", "hp": 5}\n'), 'more.JSONL')
+    ids, _ = import_rows(db.tables['item'], frame)
+    assert db.tables['item'].df.loc[ids, 'hp'].tolist() == [4, 5]
+
+
+def test_invalid_column_name_changes_nothing(db):
+    item = db.tables['item']
+    before = item.df.copy()
+    with pytest.raises(ValueError):
+        import_rows(item, pd.DataFrame({'fine': [1], 'not fine': [2]}))
+    assert item.df.equals(before) and 'fine' not in item.column_types
+
+
+def test_unsupported_file_type():
+    with pytest.raises(ValueError):
+        read_frame(io.StringIO(''), 'items.txt')
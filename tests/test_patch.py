@@ -0,0 +1,57 @@
+def test_edits_adds_and_deletes(db):
+    item = db.tables['item']
+    first, second, *_, last = item.df.index.tolist()
+    patch = item.patch({first: {'name': 'mace', 'hp': 5.0}, second: {'rare': True}},
+                       added=[{'name': 'new', 'hp': 3}], deleted=[last])
+    assert patch.ids == [first, second] and patch.columns == ['name', 'hp', 'rare']
+    assert patch.deleted == [last] and patch.rejected == []
+    assert item.df.loc[first, 'name'] == 'mace' and item.df.loc[first, 'hp'] == 5
+    assert bool(item.df.loc[second, 'rare'])
+    assert last not in item.df.index
+    added = item.df.loc[patch.added[0]]
+    assert added['name'] == 'new' and added['hp'] == 3 and added['weight'] == 0.0
+
+
+def test_untouched_cells_keep_their_values(db):
+    item = db.tables['item']
+    before = item.df.astype(item.dtypes())
+    first = item.df.index[0]
+    item.patch({first: {'name': 'mace'}})
+    after = item.df.astype(item.dtypes())
+    assert after.drop(index=first).equals(before.drop(index=first))
+    assert after.loc[first].drop('name').equals(before.loc[first].drop('name'))
+
+
+def test_missing_values_become_defaults(db):
+    item = db.tables['item']
+    first = item.df.index[0]
+    item.patch({first: {'name': None, 'hp': float('nan')}})
+    assert item.df.loc[first, 'name'] == '' and item.df.loc[first, 'hp'] == 0
+
+
+def test_unconvertible_values_are_rejected(db):
+    item = db.tables['item']
+    first, second = item.df.index[:2]
+    patch = item.patch({first: {'hp': 'lots', 'name': 'mace'}, second: {'hp': float('inf')}},
+                       added=[{'name': 'new', 'weight': 'heavy'}])
+    assert sorted(patch.rejected, key=str) == sorted([(first, 'hp', 'lots'), (second, 'hp', float('inf')),
+                                                      (patch.added[0], 'weight', 'heavy')], key=str)
+    assert item.df.loc[first, 'hp'] == 10 and item.df.loc[second, 'hp'] == -3
+    assert item.df.loc[first, 'name'] == 'mace'
+    assert item.df.loc[patch.added[0], 'weight'] == 0.0
+
+
+def test_unknown_rows_and_columns_are_ignored(db):
+    item = db.tables['item']
+    before = item.df.copy()
+    patch = item.patch({99999: {'name': 'ghost'}, int(item.df.index[0]): {'nope': 1}}, deleted=[99999])
+    assert patch.ids == [] and patch.deleted == [] and patch.added == []
+    assert item.df.equals(before)
+
+
+def test_patch_notifies_observers(db):
+    events = []
+    db.observers.append(lambda event, table, **kwargs: events.append(event))
+    item = db.tables['item']
+    item.patch({item.df.index[0]: {'name': 'mace'}}, added=[{}], deleted=[item.df.index[-1]])
+    assert events == ['update_cells', 'delete_rows', 'insert_rows']
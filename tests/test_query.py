@@ -0,0 +1,94 @@
+import pytest
+
+from tinymongo.query import QueryError
+
+# each filter with the mask it means, written against the plain item frame
+CASES = [
+    ({}, lambda df: df['hp'] == df['hp']),
+    ({'name': 'sword'}, lambda df: df['name'] == 'sword'),
+    ({'hp': {'$gte': 0, '$lt': 250}}, lambda df: (df['hp'] >= 0) & (df['hp'] < 250)),
+    ({'hp': {'$gt': 10}}, lambda df: df['hp'] > 10),
+    ({'hp': {'$lte': 10}}, lambda df: df['hp'] <= 10),
+    ({'hp': {'$ne': 10}}, lambda df: df['hp'] != 10),
+    ({'hp': {'$in': [10, 250, 7]}}, lambda df: df['hp'].isin([10, 250, 7])),
+    ({'name': {'$nin': ['sword', 'bow']}}, lambda df: ~df['name'].isin(['sword', 'bow'])),
+    ({'name': {'$gt': 'b'}}, lambda df: df['name'] > 'b'),
+    ({'name': {'$regex': '^S', '$options': 'i'}}, lambda df: df['name'].str.lower().str.startswith('s')),
+    ({'name': {'$regex': r'^\w+ of'}}, lambda df: df['name'] == '剑 of fire'),
+    ({'hp': {'$regex': r'^\d{3}$'}}, lambda df: df['hp'] == 250),
+    ({'weight': {'$lt': 1.5}, 'rare': False}, lambda df: (df['weight'] < 1.5) & ~df['rare']),
+    ({'hp': 10.0}, lambda df: df['hp'] == 10),
+    ({'hp': 'x'}, lambda df: df['hp'] != df['hp']),
+    ({'hp': {'$not': {'$gt': 10}}}, lambda df: ~(df['hp'] > 10)),
+    ({'$or': [{'name': 'axe'}, {'hp': {'$gt': 1000}}]}, lambda df: (df['name'] == 'axe') | (df['hp'] > 1000)),
+    ({'$nor': [{'rare': True}, {'hp': 0}]}, lambda df: ~df['rare'] & (df['hp'] != 0)),
+    ({'$and': [{'hp': {'$gt': 0}}, {'hp': {'$lt': 100}}]}, lambda df: (df['hp'] > 0) & (df['hp'] < 100)),
+    ({'id': {'$gt': 1003}}, lambda df: df.index.to_series(index=df.index) > 1003),
+    ({'note': {'$exists': False}}, lambda df: df['hp'] == df['hp']),
+    ({'parent.name': 'sword'}, lambda df: df['parent'].isin([f'^item:{i}' for i in df.index[df['name'] == 'sword']])),
+    ({'parent.hp': {'$lt': 0}}, lambda df: df['parent'].isin([f'^item:{i}' for i in df.index[df['hp'] < 0]])),
+]
+
+
+@pytest.fixture(params=[False, True], ids=['scan', 'indexed'])
+def item(request, db):
+    table = db.tables['item']
+    if request.param:
+        for col in ('name', 'hp', 'weight', 'rare'):
+            table.create_index(col)
+    return table
+
+
+@pytest.mark.parametrize('filter, expected', CASES)
+def test_query_matches_mask(item, filter, expected):
+    df = item.df.astype(item.dtypes())
+    assert item.match(filter).tolist() == df.index[expected(df).to_numpy()].tolist()
+
+
+def test_index_follows_updates(item):
+    ids = item.df.index
+    assert item.match({'hp': 10}).tolist() == [ids[0], ids[3]]
+    item.update_cells(ids[:1], ['hp'], [[11]])
+    new = item.insert_new_rows(1)
+    item.update_cells(new, ['hp'], [[10]])
+    assert item.match({'hp': 10}).tolist() == [ids[3], new[0]]
+    item.db.delete_rows('item', ids[3:4])
+    assert item.match({'hp': {'$in': [10, 11]}}).tolist() == [ids[0], new[0]]
+
+
+def test_find(item):
+    df = item.find({'hp': {'$gte': 0}}, projection={'name': 1, 'hp': 1}, sort=[('hp', -1), ('name', 1)], limit=3)
+    assert list(df.columns) == ['name', 'hp']
+    assert df['hp'].tolist() == [70000, 250, 10]
+    assert df.dtypes['name'] == object and df.dtypes['hp'] == 'int64'
+
+
+def test_sort_by_categorical_values(db):
+    npc = db.tables['npc']
+    npc.update_cells(npc.df.index, ['title'], [['king', 'guard', 'king', 'guard']])
+    assert npc.find(sort={'title': -1})['title'].tolist() == ['king', 'king', 'guard', 'guard']
+    assert npc.match({'title': {'$regex': 'in'}}).tolist() == npc.df.index[[0, 2]].tolist()
+
+
+@pytest.mark.parametrize('filter', [
+    [],
+    {'nope': 1},
+    {'hp': {'$bogus': 1}},
+    {'$xor': []},
+    {'$or': {'hp': 1}},
+    {'hp': {'$in': 10}},
+    {'name': {'$regex': 5}},
+    {'name': {'$regex': '('}},
+    {'name': {'$regex': 'a', '$options': 1}},
+    {'hp': {'$gt': 'x'}},
+    {'hp': [1, 2]},
+    {'name.hp': 1},
+])
+def test_bad_filters(item, filter):
+    with pytest.raises(QueryError):
+        item.match(filter)
+
+
+def test_unknown_projection(item):
+    with pytest.raises(QueryError):
+        item.find({}, projection=['nope'])
@@ -0,0 +1,104 @@
+import re
+
+import pytest
+
+from tinymongo.db import DBREF_PATTERN, DBRefCell
+
+
+def scan(db) -> dict[tuple[str, int], list[DBRefCell]]:
+    # every referrer, the slow way
+    found = {}
+    for table in db.tables.values():
+        for col in table.dbref_columns():
+            for row, value in table.df[col].items():
+                match = re.match(DBREF_PATTERN, str(value))
+                if match:
+                    found.setdefault((match[1], int(match[2])), []).append(DBRefCell(table.name, col, row))
+    return found
+
+
+def assert_index_is_current(db):
+    found = scan(db)
+    for table in db.tables.values():
+        for row_id in table.df.index:
+            assert db.referrers(table.name, [row_id]) == sorted(found.get((table.name, row_id), []))
+
+
+def test_referrers(db):
+    ids = db.tables['item'].df.index
+    npc_ids = db.tables['npc'].df.index
+    assert db.referrers('item', [ids[2]]) == [DBRefCell('npc', 'weapon', npc_ids[1]), DBRefCell('npc', 'weapon', npc_ids[2])]
+    assert db.referrers('item', [ids[0]]) == sorted([DBRefCell('item', 'parent', ids[1]), DBRefCell('item', 'parent', ids[2]),
+                                                     DBRefCell('npc', 'weapon', npc_ids[0])])
+    assert db.referrers('item', [ids[5]]) == []
+    assert_index_is_current(db)
+
+
+def test_index_follows_changes(db):
+    db.referrers('item', [])
+    item, npc = db.tables['item'], db.tables['npc']
+    ids = item.df.index
+    npc.update_cells(npc.df.index[:2], ['weapon'], [[f'^item:{ids[5]}', '']])
+    new = item.insert_new_rows(1)
+    item.update_cells(new, ['parent'], [[f'^item:{ids[5]}']])
+    item.patch({int(ids[4]): {'parent': f'^npc:{npc.df.index[3]}'}})
+    assert_index_is_current(db)
+    npc.drop_column('weapon')
+    assert_index_is_current(db)
+    db.drop_table('npc')
+    assert_index_is_current(db)
+
+
+def test_delete_is_refused_while_referenced(db):
+    ids = db.tables['item'].df.index
+    ok, referrers = db.delete_rows('item', [ids[2]])
+    assert not ok and len(referrers) == 2
+    assert ids[2] in db.tables['item'].df.index
+    ok, referrers = db.delete_rows('item', [ids[5]])
+    assert ok and referrers == []
+    assert ids[5] not in db.tables['item'].df.index
+
+
+def test_rows_referring_only_to_each_other(db):
+    ids = db.tables['item'].df.index
+    ok, referrers = db.delete_rows('item', [ids[1], ids[4]])
+    assert ok and referrers == []
+
+
+def test_cascade(db):
+    ids = db.tables['item'].df.index
+    npc_ids = db.tables['npc'].df.index
+    ok, referrers = db.delete_rows('item', [ids[0]], cascade=True)
+    assert ok and len(referrers) == 6       # two items, a third one referring to one of them, and three npcs
+    assert db.tables['item'].df.index.tolist() == [ids[3], ids[5]]
+    assert db.tables['npc'].df.index.tolist() == [npc_ids[3]]
+    assert_index_is_current(db)
+
+
+def test_rename_table_rewrites_dbrefs(db):
+    ids = db.tables['item'].df.index
+    db.rename_table('item', 'gear')
+    assert db.tables['npc'].df['weapon'].tolist()[:2] == [f'^gear:{ids[0]}', f'^gear:{ids[2]}']
+    assert db.tables['gear'].df['parent'].tolist()[1] == f'^gear:{ids[0]}'
+    assert db.tables['npc'].constraints['weapon']['target'] == 'gear'
+    assert {v.value for v in db.check_integrity()[1]} == {''}
+    assert_index_is_current(db)
+
+
+def test_reid_rows_rewrites_dbrefs(db):
+    ids = db.tables['item'].df.index
+    db.reid_rows('item', [ids[0], ids[2]], [1, 2])
+    assert db.tables['item'].df.index.tolist()[:3] == [1, ids[1], 2]
+    assert db.tables['item'].df['parent'].tolist()[1:3] == ['^item:1', '^item:1']
+    assert db.tables['npc'].df['weapon'].tolist()[:3] == ['^item:1', '^item:2', '^item:2']
+    assert db.tables['item'].insert_new_rows(1)[0] == ids[-1] + 1
+    assert_index_is_current(db)
+
+
+def test_reid_rows_rejects_duplicates(db):
+    ids = db.tables['item'].df.index
+    with pytest.raises(ValueError):
+        db.reid_rows('item', [ids[0]], [ids[1]])
+    with pytest.raises(ValueError):
+        db.reid_rows('item', [ids[0], ids[1]], [7, 7])
+    assert db.tables['item'].df.index.equals(ids)
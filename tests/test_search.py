@@ -0,0 +1,74 @@
+import pytest
+
+from tinymongo.search import SearchHit, TextIndex, tokenize
+
+
+def scan(db, text: str) -> set[SearchHit]:
+    # every matching cell, the slow way
+    *words, last = tokenize(text)
+    hits = set()
+    for table in db.tables.values():
+        for col in TextIndex.text_columns(table):
+            for row, value in table.df[col].items():
+                tokens = tokenize(str(value))
+                if all(word in tokens for word in words) and any(token.startswith(last) for token in tokens):
+                    hits.add(SearchHit(table.name, row, col))
+    return hits
+
+
+def assert_index_is_current(db):
+    fresh = TextIndex(db)
+    fresh.build()
+    assert db.text.cells == fresh.cells
+    assert {token: {n: set(hits) for n, hits in buckets.items()} for token, buckets in db.text.postings.items()} == \
+           {token: {n: set(hits) for n, hits in buckets.items()} for token, buckets in fresh.postings.items()}
+
+
+@pytest.mark.parametrize('text, tokens', [
+    ('Sword of FIRE', ['sword', 'of', 'fire']),
+    ('剑 of fire', ['剑', 'of', 'fire']),
+    ('火焰剑', ['火', '焰', '剑']),
+    ('snake_case x2', ['snake', 'case', 'x2']),
+    ('^item:1001', ['item', '1001']),
+    ('  ', []),
+])
+def test_tokenize(text, tokens):
+    assert tokenize(text) == tokens
+
+
+@pytest.mark.parametrize('text', ['sword', 'SW', 'of f', 'fire 剑', 'item 100', 'guard', 'k', 'zzz', 'sword zzz'])
+def test_search_matches_scan(db, text):
+    assert set(db.search(text, limit=1000)) == scan(db, text)
+
+
+def test_empty_search(db):
+    assert db.search('') == [] and db.search('!!') == []
+
+
+def test_ranking(db):
+    npc = db.tables['npc']
+    npc.update_cells(npc.df.index, ['title'], [['old king', 'king', 'kingdom guard', 'kingfisher']])
+    titles = [npc.df.loc[hit.row, 'title'] for hit in db.search('king') if hit.table == 'npc']
+    # whole words before prefixes, shorter cells first
+    assert titles == ['king', 'old king', 'kingfisher', 'kingdom guard']
+    assert len(db.search('king', limit=2)) == 2
+
+
+def test_index_follows_changes(db):
+    db.search('x')
+    item, npc = db.tables['item'], db.tables['npc']
+    item.update_cells(item.df.index[:2], ['name'], [['flaming sword', 'frost axe']])
+    new = item.insert_new_rows(2)
+    item.update_cells(new, ['name'], [['ice wand', 'sword']])
+    db.delete_rows('item', item.df.index[5:6])
+    item.add_column('lore', 'str')
+    item.update_cells(new[:1], ['lore'], [['forged in 火山']])
+    npc.drop_column('title')
+    db.reid_rows('item', new[:1], [1])
+    db.rename_table('npc', 'hero')
+    assert_index_is_current(db)
+    assert db.search('火') == [SearchHit('item', 1, 'lore')]
+    assert set(db.search('sword')) == scan(db, 'sword')
+    db.drop_table('hero')
+    assert_index_is_current(db)
+    assert all(hit.table == 'item' for hit in db.search('item'))
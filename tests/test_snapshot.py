@@ -0,0 +1,106 @@
+import base64
+import io
+import pickle
+import sys
+import zlib
+
+import pandas as pd
+import pytest
+
+from tinymongo import snapshot
+from tinymongo.exporters import binary, csharp, python
+from tinymongo.exporters.binary_reader import BinaryReader
+
+
+def legacy_header(monkeypatch, protocol: int, dtype) -> bytes:
+    # older exports pickled the Database of a script that defined its classes in __main__
+    main = sys.modules['__main__']
+    classes = {}
+    for name in ('Database', 'Table'):
+        cls = classes[name] = type(name, (), {'__module__': '__main__'})
+        monkeypatch.setattr(main, name, cls, raising=False)
+    db = classes['Database']()
+    table = classes['Table']()
+    index = pd.Index([1001, 1002])
+    table.__dict__.update(db=db, name='item', column_types={'?': 'bool', 'name': 'str', 'hp': 'int'}, _next_id=1002,
+                          df=pd.DataFrame({'?': [False, True], 'name': pd.Series(['a', 'b'], index=index, dtype=dtype),
+                                           'hp': [1, 2]}, index=index))
+    db.__dict__.update(name='db', tables={'item': table}, current_table=None)
+    return b'# ' + base64.b64encode(pickle.dumps(db, protocol))
+
+
+@pytest.mark.parametrize('export', [python.export, csharp.export])
+def test_header_round_trip(db, same_db, export):
+    same_db(snapshot.loads_header(export(db, cache=None).split('\n', 1)[0]), db)
+
+
+def test_read_header_streams_from_file(db, same_db):
+    same_db(snapshot.read_header(io.BytesIO(python.export(db, cache=None).encode())), db)
+
+
+def test_dump_and_load(db, same_db):
+    buffer = io.BytesIO()
+    snapshot.dump(db, buffer)
+    buffer.seek(0)
+    same_db(snapshot.load(buffer), db)
+
+
+def test_categorical_columns_keep_object_categories(db):
+    table = db.tables['npc']
+    assert table.df['title'].dtype == 'category'
+    loaded = snapshot.from_binary(BinaryReader(binary.export(db))).tables['npc']
+    assert loaded.df['title'].dtype.categories.dtype == object
+    assert loaded.df.equals(table.df)
+
+
+@pytest.mark.parametrize('protocol', [2, 4, 5])
+@pytest.mark.parametrize('dtype', [object, 'str'])
+def test_legacy_pickled_header(monkeypatch, protocol, dtype):
+    db = snapshot.loads_header(legacy_header(monkeypatch, protocol, dtype))
+    table = db.tables['item']
+    assert table.df['name'].tolist() == ['a', 'b']
+    assert table.df['hp'].tolist() == [1, 2]
+    assert table.df.index.tolist() == [1001, 1002]
+    assert table.insert_new_rows(1).tolist() == [1003]
+
+
+@pytest.mark.parametrize('payload', [
+    b"cos\nsystem\n(S'echo pwned'\ntR.",
+    b"ctinymongo.db\nDatabase.__init__.__globals__\n.",
+    b"cbuiltins\neval\n(S'1'\ntR.",
+    pickle.dumps({'not': 'a database'}),
+])
+def test_legacy_header_rejects_other_objects(payload):
+    with pytest.raises(ValueError):
+        snapshot.loads_header(b'# ' + base64.b64encode(payload))
+
+
+@pytest.mark.parametrize('header', [
+    b'',
+    b'no comment',
+    b'# ',
+    b'# !!!not base64!!!',
+    b'# ' + snapshot.SNAPSHOT_MAGIC,
+    b'# ' + snapshot.SNAPSHOT_MAGIC + b'eJzz',
+    b'# ' + snapshot.SNAPSHOT_MAGIC + base64.b64encode(zlib.compress(b'TMDB garbage')),
+    b'# ' + snapshot.SNAPSHOT_MAGIC + base64.b64encode(zlib.compress(bytes(64))),
+])
+def test_damaged_header_is_value_error(header):
+    with pytest.raises(ValueError):
+        snapshot.loads_header(header)
+
+
+def test_truncated_header_is_value_error(db):
+    header = python.export(db, cache=None).split('\n', 1)[0].encode()
+    for end in range(0, len(header) - 4, 11):
+        with pytest.raises(ValueError):
+            snapshot.loads_header(header[:end])
+
+
+@pytest.mark.parametrize('rules', [{'min': 'x'}, {'bogus': 1}, {'unique': 1}, 5])
+def test_invalid_constraints_are_rejected_on_load(db, rules):
+    # set behind the back of set_constraints, as a hand-edited file would
+    db.tables['item'].constraints = {'hp': rules}
+    data = base64.b64encode(zlib.compress(binary.export(db)))
+    with pytest.raises(ValueError):
+        snapshot.loads_header(b'# ' + snapshot.SNAPSHOT_MAGIC + data)
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from tinymongo.db import Database
+from tinymongo.storage import Store
+from tinymongo.versioning import History
+
+
+def reopen(path, same_db, expected: Database) -> Database:
+    store = Store(str(path))
+    db = store.open()
+    same_db(db, expected)
+    store.close()
+    return db
+
+
+def edit(db: Database):
+    # one of every journaled operation
+    item = db.tables['item']
+    item.insert_new_rows(2, after=item.df.index[1])
+    item.update_cells(item.df.index[:2], ['name'], [['mace', 'spear']])
+    db.delete_rows('item', [item.df.index[-1]])
+    db.reid_rows('item', [item.df.index[0]], [5000])
+    db.rename_table('npc', 'hero')
+    db.tables['hero'].add_column('level', 'int')
+    db.tables['hero'].drop_column('level')
+    db.tables['hero'].set_constraints('title', {'non_empty': True})
+    extra = db.create_table('extra')
+    extra.add_column('x', 'float')
+    db.drop_table('extra')
+
+
+def test_journal_is_replayed(tmp_path, fill, same_db):
+    store = Store(str(tmp_path))
+    db = fill(store.open())
+    edit(db)
+    store.close()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('snapshot-')]
+    reopen(tmp_path, same_db, db)
+
+
+def test_compaction_keeps_later_changes(tmp_path, fill, same_db):
+    store = Store(str(tmp_path))
+    db = fill(store.open())
+    store.compact(wait=True)
+    edit(db)
+    store.close()
+    # the snapshot replaced the journal segments before it
+    assert sorted(name.split('-')[0] for name in os.listdir(tmp_path)) == ['journal', 'snapshot']
+    reopen(tmp_path, same_db, db)
+
+
+def test_compaction_when_the_journal_grows(tmp_path, fill, same_db):
+    store = Store(str(tmp_path), compact_size=1)
+    db = fill(store.open())
+    edit(db)
+    store.close()
+    names = os.listdir(tmp_path)
+    assert len([name for name in names if name.startswith('snapshot-')]) == 1
+    reopen(tmp_path, same_db, db)
+
+
+def test_sessions_continue_the_sequence(tmp_path, fill, same_db):
+    store = Store(str(tmp_path))
+    db = fill(store.open())
+    store.close()
+    store = Store(str(tmp_path))
+    db = store.open()
+    edit(db)
+    store.compact(wait=True)
+    db.tables['item'].update_cells([5000], ['hp'], [[42]])
+    store.close()
+    assert reopen(tmp_path, same_db, db).tables['item'].df.loc[5000, 'hp'] == 42
+
+
+def test_torn_tail_is_ignored(tmp_path, fill, same_db):
+    store = Store(str(tmp_path))
+    db = fill(store.open())
+    store.close()
+    journal = max(name for name in os.listdir(tmp_path) if name.startswith('journal-'))
+    with open(tmp_path / journal, 'a', encoding='utf-8') as f:
+        f.write('{"op": "delete_rows", "tab')
+    reopen(tmp_path, same_db, db)
+
+
+def test_undo_is_journaled(tmp_path, fill, same_db):
+    store = Store(str(tmp_path))
+    db = fill(store.open())
+    history = History(db)
+    db.tables['item'].update_cells(db.tables['item'].df.index[:1], ['name'], [['changed']])
+    history.commit()
+    history.undo()
+    store.close()
+    assert reopen(tmp_path, same_db, db).tables['item'].df['name'].iloc[0] == 'sword'
+
+
+def test_reset_replaces_the_stored_database(tmp_path, db, fill, same_db):
+    store = Store(str(tmp_path))
+    fill(store.open())
+    store.reset(db)
+    db.tables['item'].update_cells(db.tables['item'].df.index[:1], ['hp'], [[7]])
+    store.close()
+    reopen(tmp_path, same_db, db)
+
+
+def test_unknown_operation(tmp_path):
+    store = Store(str(tmp_path))
+    store.open().create_table('x')
+    store.append({'op': 'explode', 'table': 'x'})
+    store.close()
+    with pytest.raises(ValueError):
+        Store(str(tmp_path)).open()
@@ -0,0 +1,122 @@
+from tinymongo.db import Database
+from tinymongo.versioning import History, diff
+
+
+def test_undo_and_redo(db, same_db):
+    history = History(db)
+    initial = db.copy()
+    item = db.tables['item']
+    item.update_cells(item.df.index[:1], ['name'], [['mace']])
+    item.insert_new_rows(2)
+    history.commit('edit')
+    edited = db.copy()
+    db.delete_rows('item', item.df.index[-1:])
+    db.rename_table('npc', 'hero')
+    db.tables['hero'].add_column('level', 'int')
+    db.create_table('extra').add_column('x', 'float')
+    changed = db.copy()
+
+    # uncommitted changes are committed by undo, so redo brings them back
+    assert history.undo().label == 'edit'
+    same_db(db, edited)
+    history.undo()
+    same_db(db, initial)
+    assert not history.can_undo() and history.undo() is None
+    history.redo()
+    same_db(db, edited)
+    history.redo()
+    same_db(db, changed)
+    assert not history.can_redo() and history.redo() is None
+
+
+def test_new_commit_drops_redo(db):
+    history = History(db)
+    db.tables['item'].update_cells(db.tables['item'].df.index[:1], ['hp'], [[1]])
+    history.commit()
+    history.undo()
+    db.tables['item'].update_cells(db.tables['item'].df.index[:1], ['hp'], [[2]])
+    history.commit()
+    assert not history.can_redo()
+    history.undo()
+    assert db.tables['item'].df['hp'].iloc[0] == 10
+
+
+def test_empty_commit_keeps_head(db):
+    history = History(db)
+    head = history.head
+    assert history.commit('nothing') is head
+    db.tables['item'].select(db.tables['item'].df.index[:2])
+    assert history.commit('selected') is not head
+
+
+def test_unchanged_columns_are_shared(db):
+    history = History(db)
+    before = history.head
+    db.tables['item'].update_cells(db.tables['item'].df.index[:1], ['hp'], [[5]])
+    after = history.commit()
+    assert after.tables['npc'] is before.tables['npc']
+    item_before, item_after = before.tables['item'], after.tables['item']
+    assert item_after.columns['name'] is item_before.columns['name']
+    assert item_after.columns['hp'] is not item_before.columns['hp']
+    [changes] = diff(before, after)
+    assert changes.table == 'item' and changes.changed_cells == {'hp': [db.tables['item'].df.index[0]]}
+
+
+def test_diff(db):
+    history = History(db)
+    before = history.head
+    item = db.tables['item']
+    new = item.insert_new_rows(1)
+    db.delete_rows('item', item.df.index[5:6])
+    item.add_column('note', 'str')
+    db.drop_table('npc')
+    db.create_table('extra')
+    diffs = {d.table: d for d in diff(before, history.commit())}
+    assert diffs['npc'].status == 'dropped' and diffs['extra'].status == 'added'
+    assert diffs['item'].added_ids == new.tolist() and len(diffs['item'].deleted_ids) == 1
+    assert diffs['item'].added_columns == ['note'] and diffs['item'].changed_cells == {}
+
+
+def test_checkpoint_and_restore(db, same_db):
+    history = History(db, budget=0)
+    history.checkpoint('start')
+    start = db.copy()
+    for hp in range(5):
+        db.tables['item'].update_cells(db.tables['item'].df.index[:1], ['hp'], [[hp]])
+        history.commit()
+    assert len(history.versions) == 1            # the budget evicted every older version
+    history.restore('start')
+    same_db(db, start)
+    assert history.head.label == 'restore start'
+
+
+def test_restore_can_be_undone(db, same_db):
+    history = History(db)
+    history.checkpoint('start')
+    db.drop_table('npc')
+    history.commit()
+    dropped = db.copy()
+    history.restore('start')
+    assert 'npc' in db.tables
+    history.undo()
+    same_db(db, dropped)
+
+
+def test_undo_keeps_dbref_index(db):
+    history = History(db)
+    ids = db.tables['item'].df.index
+    db.referrers('item', [])
+    db.reid_rows('item', ids[:1], [1])
+    history.commit()
+    history.undo()
+    assert len(db.referrers('item', ids[:1])) == 3 and db.referrers('item', [1]) == []
+    assert db.delete_rows('item', ids[:1])[0] is False
+
+
+def test_history_of_an_empty_database(same_db):
+    db = Database('empty')
+    history = History(db)
+    db.create_table('t').add_column('x', 'int')
+    history.commit()
+    history.undo()
+    same_db(db, Database('empty'))
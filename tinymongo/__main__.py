@@ -0,0 +1,5 @@
+import sys
+
+from tinymongo.cli import main
+
+sys.exit(main())
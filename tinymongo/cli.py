@@ -0,0 +1,96 @@
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from tinymongo import snapshot
+from tinymongo.db import Database
+from tinymongo.exporters import binary, csharp, python
+from tinymongo.exporters.binary_reader import BINARY_MAGIC
+from tinymongo.storage import Store
+
+FORMATS = {
+    # format: (extension, export_to, file mode)
+    'python': ('.py', python.export_to, 'w'),
+    'csharp': ('.cs', csharp.export_to, 'w'),
+    'binary': ('.bin', binary.export_to, 'wb'),
+}
+MAX_SHOWN_ERRORS = 20
+
+def load_database(path: str) -> Database:
+    # a store directory, a binary export or snapshot, or a .py/.cs export with a metadata header
+    if os.path.isdir(path):
+        store = Store(path)
+        db = store.open()
+        store.close()
+        return db
+    with open(path, 'rb') as f:
+        if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            return snapshot.read_binary(path)
+        f.seek(0)
+        return snapshot.read_header(f)
+
+def export_database(db: Database, fmt: str, path: str, **options) -> int:
+    _, export_to, mode = FORMATS[fmt]
+    encoding = None if 'b' in mode else 'utf-8'
+    with open(path, mode, encoding=encoding) as f:
+        return export_to(db, f, **options)
+
+def run_job(source: str, fmt: str, path: str, check: bool, link: bool = False,
+            pool: bool = False) -> tuple[int | None, list[str]]:
+    # one (database, format) pair, run in a worker process
+    db = load_database(source)
+    if check:
+        ok, violations = db.check_integrity()
+        if not ok:
+            return None, [f'{v.value!r} is not a valid dbref in {v.table}.{v.column}, row {v.row}' for v in violations]
+    options = {'link': link, 'pool': pool} if fmt != 'binary' else {}
+    return export_database(db, fmt, path, **options), []
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m tinymongo', description='Export tinymongo databases without the editor.')
+    parser.add_argument('sources', nargs='+', help='store directories, binary exports or .py/.cs exports')
+    parser.add_argument('-f', '--format', nargs='+', choices=list(FORMATS), default=['python', 'csharp'], dest='formats')
+    parser.add_argument('-o', '--output-dir', default='.', help='directory for the generated files')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--no-check', dest='check', action='store_false', help='skip the dbref integrity check')
+    parser.add_argument('--link', action='store_true', help='resolve dbrefs into direct references when the generated code loads')
+    parser.add_argument('--pool', action='store_true', help='declare repeated strings once in the Python and C# code')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = []
+    names = set()
+    for source in args.sources:
+        name = base = os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+        suffixes = itertools.count(1)
+        while name in names:
+            name = f'{base}_{next(suffixes)}'
+        names.add(name)
+        for fmt in args.formats:
+            ext = FORMATS[fmt][0]
+            path = os.path.join(args.output_dir, name + ext)
+            if os.path.abspath(path) == os.path.abspath(source):
+                path = os.path.join(args.output_dir, f'{name}.out{ext}')
+            jobs.append((source, fmt, path))
+
+    failed = set()
+    with ProcessPoolExecutor(args.jobs) as pool:
+        futures = [pool.submit(run_job, source, fmt, path, args.check, args.link, args.pool) for source, fmt, path in jobs]
+        for (source, fmt, path), future in zip(jobs, futures):
+            try:
+                size, errors = future.result()
+            except (OSError, ValueError) as e:
+                size, errors = None, [str(e)]
+            if errors:
+                # every format of a source fails the same way; report it once
+                if source not in failed:
+                    for error in errors[:MAX_SHOWN_ERRORS]:
+                        print(f'{source}: {error}', file=sys.stderr)
+                    if len(errors) > MAX_SHOWN_ERRORS:
+                        print(f'{source}: ... and {len(errors) - MAX_SHOWN_ERRORS} more', file=sys.stderr)
+                failed.add(source)
+                continue
+            print(f'{source} -> {path} ({fmt}, {size} bytes)')
+    return 1 if failed else 0
@@ -1,6 +1,20 @@
-import streamlit as st
+import numpy as np
+import pandas as pd
+
+from tinymongo import query
+
+# strings are dictionary-encoded when at most this fraction of them is distinct
+CATEGORY_RATIO = 0.5
+
+def column_config():
+    # streamlit is only needed by the editor, not by exporting
+    import streamlit as st
+    return st.column_config
 
 class ColumnType:
+    # constraints a column of this type accepts, see tinymongo.constraints
+    rules = ('non_empty', 'unique', 'allowed')
+
     def get_config(self, label: str):
         raise NotImplementedError
     
@@ -18,35 +32,85 @@ class ColumnType:
         cls_name = cls_name.removeprefix('ColumnType')
         return cls_name.lower()
 
+    def coerce(self, value):
+        # cells coming back from the editor may be missing or of a looser type
+        if value is None or value != value:
+            return self.default
+        return type(self.default)(value)
+
+    def compact(self, values):
+        # the smallest representation of `values`; the editor and exporters still see plain values
+        return values.astype(self.dtype)
+
+    def empty(self, values):
+        return values.isna()
+
+    def check(self, rule: str, arg, values):
+        # mask of the values breaking one rule that needs no other rows
+        if rule == 'non_empty':
+            return self.empty(values) if arg else np.zeros(len(values), dtype=bool)
+        if rule == 'allowed':
+            return ~values.isin(list(arg))
+        if rule == 'min':
+            return values < arg
+        if rule == 'max':
+            return values > arg
+        if rule == 'regex':
+            return ~query.contains(values, arg)
+        raise ValueError(f'unknown constraint {rule!r}')
+
 class ColumnTypeStr(ColumnType):
     default = ''
     dtype = 'object'
+    rules = (*ColumnType.rules, 'regex')
     def get_config(self, label: str):
-        return st.column_config.TextColumn(label, default='')
+        return column_config().TextColumn(label, default='')
+
+    def compact(self, values):
+        # judged on the filled cells only, new rows are all empty until edited
+        present = values[values != '']
+        if len(present) and present.nunique() <= len(present) * CATEGORY_RATIO:
+            if values.dtype == 'category':
+                # updates and deletes leave categories no row uses
+                unused = values.nunique() < len(values.cat.categories)
+                return values.cat.remove_unused_categories() if unused else values
+            # object categories like the ones Table._fit widens to; astype('category') would infer str
+            return values.astype(pd.CategoricalDtype(pd.Index(values.unique(), dtype=object).sort_values()))
+        return values.astype(self.dtype)
+
+    def empty(self, values):
+        return values.isna() | (values == '')
     
 class ColumnTypeInt(ColumnType):
     default = 0
     dtype = 'int64'
+    rules = (*ColumnType.rules, 'min', 'max')
     def get_config(self, label: str):
-        return st.column_config.NumberColumn(label, default=0, step=1, min_value=-10000000, max_value=10000000)
+        return column_config().NumberColumn(label, default=0, step=1, min_value=-10000000, max_value=10000000)
+
+    def compact(self, values):
+        if len(values):
+            low, high = values.min(), values.max()
+            for dtype in ('int8', 'int16', 'int32'):
+                if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                    return values.astype(dtype)
+        return values.astype(self.dtype)
     
 class ColumnTypeFloat(ColumnType):
     default = 0.0
     dtype = 'float64'
+    rules = (*ColumnType.rules, 'min', 'max')
     def get_config(self, label: str):
-        return st.column_config.NumberColumn(label, default=0.0)
+        return column_config().NumberColumn(label, default=0.0)
     
 class ColumnTypeBool(ColumnType):
     default = False
     dtype = 'bool'
     def get_config(self, label: str):
-        return st.column_config.CheckboxColumn(label, default=False)
+        return column_config().CheckboxColumn(label, default=False)
     
-class ColumnTypeDbref(ColumnType):
-    default = ''
-    dtype = 'object'
-    def get_config(self, label: str):
-        return st.column_config.TextColumn(label, default='')
+class ColumnTypeDbref(ColumnTypeStr):
+    rules = (*ColumnTypeStr.rules, 'target')
     
 COLUMN_TYPES: dict[str, ColumnType] = {
     'str': ColumnTypeStr(),
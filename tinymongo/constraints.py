@@ -0,0 +1,181 @@
+import re
+from typing import TYPE_CHECKING, NamedTuple
+
+import pandas as pd
+
+from tinymongo import query
+from tinymongo.columns import COLUMN_TYPES
+
+if TYPE_CHECKING:
+    from tinymongo.db import Database, Table
+
+ALL = None      # every row of the column needs checking
+
+
+class ConstraintViolation(NamedTuple):
+    value: object
+    table: str
+    column: str
+    row: int
+    rule: str
+
+
+class ConstraintError(ValueError):
+    def __init__(self, violations: list[ConstraintViolation]):
+        super().__init__(f'{len(violations)} constraint violations, first: {violations[0]}')
+        self.violations = violations
+
+
+def validate_rules(col_type_name: str, rules: dict) -> dict:
+    col_type = COLUMN_TYPES[col_type_name]
+    for rule, arg in rules.items():
+        if rule not in col_type.rules:
+            raise ValueError(f'{rule!r} is not a constraint of {col_type_name} columns')
+        if rule in ('min', 'max') and (isinstance(arg, bool) or not isinstance(arg, (int, float))):
+            raise ValueError(f'{rule} must be a number, not {arg!r}')
+        elif rule in ('unique', 'non_empty') and not isinstance(arg, bool):
+            raise ValueError(f'{rule} must be true or false, not {arg!r}')
+        elif rule in ('regex', 'target') and not isinstance(arg, str):
+            raise ValueError(f'{rule} must be a string, not {arg!r}')
+        elif rule == 'regex':
+            try:
+                re.compile(arg)
+            except re.error as e:
+                raise ValueError(f'invalid regex {arg!r}: {e}') from e
+        elif rule == 'allowed' and not isinstance(arg, (list, tuple)):
+            raise ValueError('allowed values must be a list')
+    return dict(rules)
+
+def broken_refs(db: 'Database', values: pd.Series, target: str) -> pd.Series:
+    # values that are neither empty nor a dbref to an existing row of `target`
+    table = db.tables.get(target)
+    refs = [] if table is None else ('^' + target + ':' + table.df.index.astype(str)).tolist()
+    return query.apply(values, lambda v: ~(v.isin(refs) | (v == '')))
+
+def enforce(db: 'Database'):
+    ok, violations = db.check_constraints()
+    if not ok:
+        raise ConstraintError(violations)
+
+
+class Validator:
+    # failing rows per (table, column, rule); after the first check only rows changed since the last one are re-checked
+    def __init__(self, db: 'Database'):
+        self.db = db
+        self.built = False
+        self.failed: dict[str, dict[str, dict[str, set[int]]]] = {}
+        self.pending: dict[str, dict[str, set[int] | None]] = {}
+
+    def _mark(self, table: 'Table', columns=None, rows=ALL):
+        pending = self.pending.setdefault(table.name, {})
+        for col in table.constraints if columns is None else columns:
+            if col not in table.constraints:
+                continue
+            if rows is ALL or pending.get(col, set()) is ALL:
+                pending[col] = ALL
+            else:
+                pending.setdefault(col, set()).update(rows)
+
+    def _mark_targets(self, target: str):
+        # dbref targets appearing, disappearing or being renumbered affect columns pointing at them
+        for table in self.db.tables.values():
+            self._mark(table, [col for col, rules in table.constraints.items() if rules.get('target') == target])
+
+    def __call__(self, event: str, table: 'Table', **kwargs):
+        if not self.built:
+            return
+        name = table.name
+        if event == 'update_cells':
+            self._mark(table, kwargs['columns'], kwargs['ids'])
+        elif event == 'insert_rows':
+            self._mark(table, rows=kwargs['ids'])
+            self._mark_targets(name)
+        elif event == 'delete_rows':
+            for rules in self.failed.get(name, {}).values():
+                for rows in rules.values():
+                    rows.difference_update(kwargs['ids'])
+            # rows that duplicated a deleted one may be unique now
+            self._mark(table, [col for col, rules in table.constraints.items() if rules.get('unique')], [])
+            self._mark_targets(name)
+        elif event in ('reid_rows', 'replace_table', 'create_table'):
+            self.failed.pop(name, None)
+            self._mark(table)
+            self._mark_targets(name)
+        elif event in ('drop_column', 'set_constraints'):
+            self.failed.get(name, {}).pop(kwargs['column'], None)
+            self.pending.get(name, {}).pop(kwargs['column'], None)
+            self._mark(table, [kwargs['column']])
+        elif event == 'rename_table':
+            old_name = kwargs['old_name']
+            for state in (self.failed, self.pending):
+                if old_name in state:
+                    state[name] = state.pop(old_name)
+            self._mark_targets(old_name)
+            self._mark_targets(name)
+        elif event == 'drop_table':
+            self.failed.pop(name, None)
+            self.pending.pop(name, None)
+            self._mark_targets(name)
+
+    def _check(self, table: 'Table', col: str, rows):
+        rules = table.constraints[col]
+        col_type = table.get_column_type(col)
+        values = table.df[col] if rows is ALL else table.df.loc[table.df.index.intersection(list(rows)), col]
+        failed = self.failed.setdefault(table.name, {}).setdefault(col, {})
+        for rule, arg in rules.items():
+            if rule == 'unique':
+                # depends on the whole column
+                if arg:
+                    duplicated = table.df[col].duplicated(keep=False).to_numpy()
+                    failed[rule] = set(table.df.index[duplicated].tolist())
+                continue
+            if rule == 'target':
+                mask = broken_refs(self.db, values, arg)
+            else:
+                mask = query.apply(values, lambda v: col_type.check(rule, arg, v))
+            hits = values.index[mask].tolist()
+            if rows is ALL:
+                failed[rule] = set(hits)
+            else:
+                failed.setdefault(rule, set()).difference_update(rows)
+                failed[rule].update(hits)
+
+    def check(self):
+        with self.db.notify_lock:
+            if not self.built:
+                for table in self.db.tables.values():
+                    self._mark(table)
+                self.built = True
+            for name, columns in self.pending.items():
+                table = self.db.tables.get(name)
+                for col, rows in columns.items():
+                    if table is not None and col in table.constraints and col in table.df.columns:
+                        self._check(table, col, rows)
+            self.pending.clear()
+
+    def violations(self, table_name: str | None = None) -> list[ConstraintViolation]:
+        self.check()
+        violations = []
+        with self.db.notify_lock:
+            for name, columns in self.failed.items():
+                if table_name is not None and name != table_name:
+                    continue
+                df = self.db.tables[name].df
+                for col, rules in columns.items():
+                    for rule, rows in rules.items():
+                        rows = df.index.intersection(list(rows))
+                        violations.extend(ConstraintViolation(value, name, col, row, rule)
+                                          for row, value in df.loc[rows, col].items())
+        return sorted(violations, key=lambda v: (v.table, v.row, v.column, v.rule))
+
+    def describe(self, table_name: str, ids) -> pd.Series:
+        # per row, the columns and rules it breaks, e.g. 'hp: min, name: regex'
+        self.check()
+        broken = {row_id: [] for row_id in ids}
+        with self.db.notify_lock:
+            for col, rules in self.failed.get(table_name, {}).items():
+                for rule, rows in rules.items():
+                    for row_id in broken:
+                        if row_id in rows:
+                            broken[row_id].append(f'{col}: {rule}')
+        return pd.Series([', '.join(messages) for messages in broken.values()], index=ids, dtype=object)
@@ -1,5 +1,35 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import NamedTuple
+
+import numpy as np
 import pandas as pd
+from tinymongo import query
 from tinymongo.columns import COLUMN_TYPES, ColumnType
+from tinymongo.constraints import ConstraintViolation, Validator, validate_rules
+from tinymongo.locking import RWLock, locked
+from tinymongo.profiling import PROFILER, profiled
+from tinymongo.search import SearchHit, TextIndex
+
+DBREF_PATTERN = r'^\^([^:]+):([+-]?\d{1,18})$'
+
+class DBRefViolation(NamedTuple):
+    value: object
+    table: str
+    column: str
+    row: int
+
+class DBRefCell(NamedTuple):
+    table: str
+    column: str
+    row: int
+
+class TablePatch(NamedTuple):
+    ids: list[int]
+    columns: list[str]
+    added: list[int]
+    deleted: list[int]
+    rejected: list[tuple[int, str, object]]    # (id, column, value) of cells kept as they were
 
 class Table:
     column_types: dict[str, str]
@@ -10,46 +40,538 @@ class Table:
         self.df = pd.DataFrame(columns=['?'])
         self.column_types = {'?': 'bool'}
         self._next_id = 1000
+        self.version = 0                # bumped on every notified change
+        self.indexes = {}               # column -> (version, SortedIndex), or None until first used
+        self.constraints = {}           # column -> {rule: argument}, see tinymongo.constraints
+        self.lock = RWLock()
     
     def get_column_type(self, col_name: str) -> 'ColumnType':
         return COLUMN_TYPES[self.column_types[col_name]]
 
+    def __setstate__(self, state: dict):
+        # pickles from older versions lack attributes added since
+        self.__init__(state['db'], state['name'])
+        self.__dict__.update(state)
+
+    def dbref_columns(self) -> list[str]:
+        return [col for col in self.df.columns if self.column_types[col] == 'dbref']
+
     def next_id(self):
         self._next_id += 1
         return self._next_id
 
+    def next_ids(self, count: int) -> pd.Index:
+        # allocate a block of ids at once
+        ids = pd.RangeIndex(self._next_id + 1, self._next_id + 1 + count)
+        self._next_id += count
+        return ids
+
+    @locked('read')
+    def copy(self, db: 'Database') -> 'Table':
+        table = Table(db, self.name)
+        table.df = self.df.copy()
+        table.column_types = self.column_types.copy()
+        table._next_id = self._next_id
+        table.indexes = dict.fromkeys(self.indexes)
+        table.constraints = {col: dict(rules) for col, rules in self.constraints.items()}
+        return table
+
+    def new_rows(self, count: int = 1) -> pd.DataFrame:
+        ids = pd.Index(self.next_ids(count), dtype='int64')
+        data = {}
+        for col in self.df.columns:
+            col_type = self.get_column_type(col)
+            data[col] = pd.Series(col_type.default, index=ids, dtype=col_type.dtype)
+        return pd.DataFrame(data, index=ids, columns=self.df.columns)
+
+    def position(self, row_id: int) -> int:
+        return self.df.index.get_loc(row_id)
+
+    @locked('read')
+    def contains(self, col_name: str, text: str) -> pd.Index:
+        values = self.df[col_name].astype(str)
+        return self.df.index[values.str.contains(text, case=False, regex=False).to_numpy()]
+
+    @profiled('find', per_table=True)
+    @locked('read')
+    def find(self, filter: dict | None = None, projection=None, sort=None, limit: int | None = None) -> pd.DataFrame:
+        return query.find(self, filter, projection, sort, limit)
+
+    @profiled('match', per_table=True)
+    @locked('read')
+    def match(self, filter: dict) -> pd.Index:
+        return self.df.index[query.evaluate(self, filter)]
+
+    def create_index(self, col_name: str):
+        if col_name not in self.df.columns:
+            raise KeyError(col_name)
+        self.indexes.setdefault(col_name, None)
+
+    def drop_index(self, col_name: str):
+        self.indexes.pop(col_name, None)
+
+    @profiled('page', per_table=True)
+    @locked('read')
+    def page(self, offset: int, limit: int, sort_by: str | None = None, ascending: bool = True,
+             ids: pd.Index | None = None) -> pd.DataFrame:
+        # copy of one window of rows, optionally restricted to `ids` and sorted by a column
+        index = self.df.index if ids is None else ids
+        if sort_by is not None:
+            values = self.df[sort_by] if ids is None else self.df.loc[ids, sort_by]
+            index = values.sort_values(ascending=ascending, kind='stable').index
+        return self.df.loc[index[offset:offset+limit]].astype(self.dtypes())
+
+    def dtypes(self) -> dict[str, str]:
+        # the plain dtypes the editor and new rows use
+        return {col: COLUMN_TYPES[col_type_name].dtype for col, col_type_name in self.column_types.items()}
+
+    @locked('write')
+    def compact(self, columns: list[str] | None = None):
+        for col in self.df.columns if columns is None else columns:
+            self.df[col] = self.get_column_type(col).compact(self.df[col])
+
+    @locked('read')
+    def memory_report(self) -> pd.DataFrame:
+        # bytes per column as stored, against the plain dtype
+        report = pd.DataFrame({
+            'type': pd.Series(self.column_types),
+            'dtype': self.df.dtypes.astype(str),
+            'bytes': self.df.memory_usage(index=False, deep=True),
+            'plain_bytes': self.df.astype(self.dtypes()).memory_usage(index=False, deep=True),
+        })
+        report.loc['(index)'] = ['', str(self.df.index.dtype), self.df.index.memory_usage(), self.df.index.memory_usage()]
+        return report
+
+    def _fit(self, col: str, values):
+        # widen a compact column so that `values` can be assigned into it
+        current = self.df[col]
+        if isinstance(current.dtype, pd.CategoricalDtype):
+            categories = current.cat.categories.union(pd.Index(values, dtype=object).unique())
+            if len(categories) > len(current.cat.categories):
+                self.df[col] = current.cat.set_categories(categories)
+        elif current.dtype.kind == 'i' and current.dtype != 'int64' and len(values):
+            values = np.asarray(values)
+            info = np.iinfo(current.dtype)
+            if values.min() < info.min or values.max() > info.max:
+                self.df[col] = current.astype('int64')
+            else:
+                values = values.astype(current.dtype)
+        return values
+
+    def _recompact(self, columns):
+        # changed strings may leave categories unused, or make a column worth categorizing or no longer so
+        self.compact([col for col in columns if self.column_types[col] in ('str', 'dbref')])
+
+    # all mutations go through the methods below so that observers see them
+
+    @locked('write')
+    def add_column(self, col_name: str, col_type_name: str):
+        col_type = COLUMN_TYPES[col_type_name]
+        self.df[col_name] = [col_type.default] * len(self.df)
+        self.df[col_name] = col_type.compact(self.df[col_name].astype(col_type.dtype))
+        self.column_types[col_name] = col_type_name
+        self.db.notify('add_column', self, column=col_name, col_type=col_type_name)
+
+    @locked('write')
+    def drop_column(self, col_name: str):
+        self.df.drop(col_name, axis=1, inplace=True)
+        self.column_types.pop(col_name)
+        self.indexes.pop(col_name, None)
+        self.constraints.pop(col_name, None)
+        self.db.notify('drop_column', self, column=col_name)
+
+    @locked('write')
+    def set_constraints(self, col_name: str, rules: dict):
+        # replaces the column's constraints; no rules removes them
+        rules = validate_rules(self.column_types[col_name], rules)
+        if rules:
+            self.constraints[col_name] = rules
+        else:
+            self.constraints.pop(col_name, None)
+        self.db.notify('set_constraints', self, column=col_name, rules=rules)
+
+    @profiled('insert_rows', per_table=True)
+    @locked('write')
+    def insert_rows(self, rows: pd.DataFrame, after: int | None = None):
+        # the whole batch is spliced in with a single concat, placed after row `after` (or at the end)
+        rows = rows[list(self.df.columns)]
+        dtypes = self.df.dtypes
+        if len(self.df) == 0:
+            self.df = rows.astype(self.dtypes())
+            self.compact()
+        else:
+            if after is None:
+                self.df = pd.concat([self.df, rows])
+            else:
+                pos = self.position(after) + 1
+                self.df = pd.concat([self.df.iloc[:pos], rows, self.df.iloc[pos:]])
+            # concat falls back to plain dtypes when the compact ones differ
+            self.compact([col for col in self.df.columns if self.df[col].dtype != dtypes[col]])
+        if len(rows):
+            self._next_id = max(self._next_id, int(rows.index.max()))
+        self.db.notify('insert_rows', self, ids=rows.index.tolist(), after=after)
+
+    @locked('write')
+    def insert_new_rows(self, count: int = 1, after: int | None = None) -> pd.Index:
+        rows = self.new_rows(count)
+        self.insert_rows(rows, after)
+        return rows.index
+
+    @profiled('delete_rows', per_table=True)
+    @locked('write')
+    def delete_rows(self, ids):
+        deleted = self.df.index.isin(ids)
+        ids = self.df.index[deleted].tolist()
+        if ids:
+            self.df = self.df[~deleted]
+            self._recompact([col for col in self.df.columns if self.df[col].dtype == 'category'])
+            self.db.notify('delete_rows', self, ids=ids)
+
+    @locked('write')
+    def reid_rows(self, ids, new_ids):
+        ids = [int(i) for i in ids]
+        new_ids = [int(i) for i in new_ids]
+        kept = self.df.index.difference(ids)
+        if len(set(new_ids)) != len(new_ids) or kept.isin(new_ids).any():
+            raise ValueError('new ids must be unique within the table')
+        index = self.df.index.to_numpy(copy=True)
+        index[self.df.index.get_indexer(ids)] = new_ids
+        self.df = self.df.set_axis(pd.Index(index, dtype='int64'))
+        self._next_id = max([self._next_id, *new_ids])
+        self.db.notify('reid_rows', self, ids=ids, new_ids=new_ids)
+
+    @locked('write')
+    def replace(self, df: pd.DataFrame, column_types: dict[str, str], next_id: int, constraints: dict | None = None):
+        # swap in whole new contents, e.g. an older version of the table
+        self.df = df
+        self.column_types = dict(column_types)
+        self._next_id = next_id
+        self.indexes = {col: None for col in self.indexes if col in df.columns}
+        if constraints is not None:
+            self.constraints = {col: dict(rules) for col, rules in constraints.items()}
+        self.constraints = {col: rules for col, rules in self.constraints.items() if col in df.columns}
+        self.db.notify('replace_table', self)
+
+    @locked('write')
+    def rename(self, new_name: str):
+        with self.db.notify_lock:
+            if new_name in self.db.tables:
+                raise ValueError(f'table {new_name} already exists')
+            old_name = self.name
+            self.name = new_name
+            self.db.tables = {new_name if name == old_name else name: table for name, table in self.db.tables.items()}
+        self.db.notify('rename_table', self, old_name=old_name)
+
+    @profiled('update_cells', per_table=True)
+    @locked('write')
+    def update_cells(self, ids, columns: list[str], values: list):
+        # `values` holds one sequence per column
+        ids = list(ids)
+        for col, col_values in zip(columns, values):
+            self.df.loc[ids, col] = self._fit(col, col_values)
+        self._recompact(columns)
+        self.db.notify('update_cells', self, ids=ids, columns=columns)
+
+    @locked('write')
+    def select(self, ids):
+        selected = self.df.index.isin(ids)
+        changed = self.df['?'].to_numpy(dtype=bool) != selected
+        if changed.any():
+            self.update_cells(self.df.index[changed], ['?'], [selected[changed]])
+
+    @profiled('patch', per_table=True)
+    @locked('write')
+    def patch(self, edited: dict[int, dict], added: list[dict] = (), deleted: list[int] = ()) -> TablePatch:
+        # apply editor deltas in place: {id: {col: value}} edits, new rows as {col: value}, deleted ids
+        # values that do not convert to the column type leave the cell as it was and are reported
+        rejected = []
+
+        def coerce(col_type: ColumnType, row_id: int, col: str, value, current):
+            try:
+                return col_type.coerce(value)
+            except (TypeError, ValueError, OverflowError):
+                rejected.append((row_id, col, value))
+                return current
+
+        ids = [int(row_id) for row_id in edited if row_id in self.df.index]
+        columns = list(dict.fromkeys(col for row_id in ids for col in edited[row_id] if col in self.column_types))
+        if ids and columns:
+            values = []
+            for col in columns:
+                col_type = self.get_column_type(col)
+                current = self.df.loc[ids, col].tolist()
+                values.append([coerce(col_type, row_id, col, edited[row_id][col], value) if col in edited[row_id] else value
+                               for row_id, value in zip(ids, current)])
+            self.update_cells(ids, columns, values)
+        else:
+            ids, columns = [], []
+
+        deleted = self.df.index[self.df.index.isin(deleted)].tolist()
+        self.delete_rows(deleted)
+
+        rows = self.new_rows(len(added))
+        for col in rows.columns:
+            col_type = self.get_column_type(col)
+            rows[col] = pd.Series([coerce(col_type, row_id, col, row.get(col), col_type.default)
+                                   for row_id, row in zip(rows.index, added)], index=rows.index, dtype=col_type.dtype)
+        if added:
+            self.insert_rows(rows)
+        return TablePatch(ids, columns, rows.index.tolist(), deleted, rejected)
+
+
+class RefIndex:
+    # reverse index of dbrefs: target (table, id) -> the cells pointing at it
+    # built on first use, then kept up to date from table events
+    def __init__(self, db: 'Database'):
+        self.db = db
+        self.built = False
+        self.forward: dict[str, dict[int, dict[str, tuple[str, int]]]] = {}
+        self.reverse: dict[str, dict[int, set[DBRefCell]]] = {}
+
+    def build(self):
+        self.forward.clear()
+        self.reverse.clear()
+        for table in self.db.tables.values():
+            self._add(table, table.df.index, table.dbref_columns())
+        self.built = True
+
+    def _add(self, table: Table, ids, columns: list[str]):
+        rows = self.forward.setdefault(table.name, {})
+        for col in columns:
+            parts = table.df.loc[ids, col].astype(str).str.extract(DBREF_PATTERN).dropna()
+            for row, target_table, target_id in zip(parts.index.tolist(), parts[0], parts[1].astype('int64').tolist()):
+                rows.setdefault(row, {})[col] = (target_table, target_id)
+                self.reverse.setdefault(target_table, {}).setdefault(target_id, set()).add(DBRefCell(table.name, col, row))
+
+    def _remove(self, table_name: str, ids, columns: list[str] | None = None):
+        rows = self.forward.get(table_name, {})
+        for row in ids:
+            cells = rows.get(row)
+            if not cells:
+                continue
+            for col in list(cells) if columns is None else [col for col in columns if col in cells]:
+                target_table, target_id = cells.pop(col)
+                targets = self.reverse[target_table]
+                targets[target_id].discard(DBRefCell(table_name, col, row))
+                if not targets[target_id]:
+                    del targets[target_id]
+            if not cells:
+                del rows[row]
+
+    def _move(self, table_name: str, old_name: str, id_map: dict[int, int]):
+        # relabel rows of `old_name` as `table_name` with ids mapped through `id_map`, keeping referring cells pointing at them
+        rows = self.forward.pop(old_name, {})
+        moved = {id_map.get(row, row): cells for row, cells in rows.items()}
+        for row, cells in rows.items():
+            for col, (target_table, target_id) in cells.items():
+                referrers = self.reverse[target_table][target_id]
+                referrers.discard(DBRefCell(old_name, col, row))
+                referrers.add(DBRefCell(table_name, col, id_map.get(row, row)))
+        self.forward[table_name] = moved
+
+        targets = self.reverse.pop(old_name, {})
+        targets = {id_map.get(target_id, target_id): cells for target_id, cells in targets.items()}
+        for target_id, cells in targets.items():
+            for cell in cells:
+                self.forward[cell.table][cell.row][cell.column] = (table_name, target_id)
+        self.reverse[table_name] = targets
+
+    def __call__(self, event: str, table: Table, **kwargs):
+        if not self.built:
+            return
+        if event == 'insert_rows':
+            self._add(table, kwargs['ids'], table.dbref_columns())
+        elif event == 'delete_rows':
+            self._remove(table.name, kwargs['ids'])
+        elif event == 'update_cells':
+            columns = [col for col in kwargs['columns'] if table.column_types[col] == 'dbref']
+            self._remove(table.name, kwargs['ids'], columns)
+            self._add(table, kwargs['ids'], columns)
+        elif event == 'drop_column':
+            self._remove(table.name, list(self.forward.get(table.name, {})), [kwargs['column']])
+        elif event == 'replace_table':
+            self._remove(table.name, list(self.forward.get(table.name, {})))
+            self._add(table, table.df.index, table.dbref_columns())
+        elif event == 'reid_rows':
+            self._move(table.name, table.name, dict(zip(kwargs['ids'], kwargs['new_ids'])))
+        elif event == 'rename_table':
+            self._move(table.name, kwargs['old_name'], {})
+        elif event == 'drop_table':
+            self._remove(table.name, list(self.forward.get(table.name, {})))
+            self.forward.pop(table.name, None)
+
 
 class Database:
     name: str
     tables: dict[str, Table]
 
-    current_table: Table | None
-
     def __init__(self, name: str):
         self.name = name
-        self.tables = {}
-        self.current_table = None
+        self.tables = {}                # replaced rather than mutated, so other threads can iterate it
+        self.refs = RefIndex(self)
+        self.validator = Validator(self)
+        self.text = TextIndex(self)
+        self.observers = [self.refs, self.validator, self.text]
+        self.notify_lock = threading.RLock()
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['name'])
+        self.__dict__.update(state)
+
+    def notify(self, event: str, table: Table, **kwargs):
+        # table locks are always taken before this one
+        with self.notify_lock:
+            table.version += 1
+            for observer in self.observers:
+                observer(event, table, **kwargs)
 
-    def create_table(self, table_name: str):
+    @contextmanager
+    def _lock_tables(self, mode: str):
+        # every table, always in the same order
+        tables = self.tables
+        with ExitStack() as stack:
+            for name in sorted(tables):
+                stack.enter_context(getattr(tables[name].lock, mode)())
+            yield
+
+    def read_locked(self):
+        return self._lock_tables('read')
+
+    def write_locked(self):
+        return self._lock_tables('write')
+
+    def versions(self) -> dict[str, int]:
+        return {name: table.version for name, table in self.tables.items()}
+
+    def copy(self) -> 'Database':
+        db = Database(self.name)
+        db.tables = {table.name: table.copy(db) for table in self.tables.values()}
+        return db
+
+    def create_table(self, table_name: str) -> Table:
         table = Table(self, table_name)
-        self.tables[table_name] = table
+        with self.notify_lock:
+            if table_name in self.tables:
+                raise ValueError(f'table {table_name} already exists')
+            self.tables = {**self.tables, table_name: table}
+        self.notify('create_table', table)
+        return table
 
-    def set_current_table(self, table_name: str | None):
-        self.current_table = self.tables.get(table_name)
-  
-    def check_integrity(self) -> tuple[bool, str]:
-        for table in self.tables.values():
-            for col in table.df.columns:
-                col_type = table.get_column_type(col)
-                if col_type.name != 'dbref':
+    def drop_table(self, table_name: str):
+        table = self.tables[table_name]
+        with table.lock.write():
+            with self.notify_lock:
+                self.tables = {name: t for name, t in self.tables.items() if name != table_name}
+            self.notify('drop_table', table)
+
+    def referrers(self, table_name: str, ids) -> list[DBRefCell]:
+        # the dbref cells pointing at rows `ids` of `table_name`
+        with self.notify_lock:
+            if not self.refs.built:
+                self.refs.build()
+            targets = self.refs.reverse.get(table_name, {})
+            return sorted(cell for row_id in ids for cell in targets.get(int(row_id), ()))
+
+    @profiled('search')
+    def search(self, text: str, limit: int = 100) -> list[SearchHit]:
+        # str and dbref cells of any table containing the words of `text`, best matches first
+        with self.read_locked(), self.notify_lock:
+            if not self.text.built:
+                self.text.build()
+            return self.text.search(text, limit)
+
+    def delete_rows(self, table_name: str, ids, cascade: bool = False) -> tuple[bool, list[DBRefCell]]:
+        with self.write_locked():
+            return self._delete_rows(table_name, ids, cascade)
+
+    def _delete_rows(self, table_name: str, ids, cascade: bool) -> tuple[bool, list[DBRefCell]]:
+        # refuses when other rows refer to the deleted ones, unless `cascade` also deletes those rows
+        pending = {table_name: {int(row_id) for row_id in ids}}
+        queue = [(table_name, row_id) for row_id in pending[table_name]]
+        referrers = []
+        while queue:
+            target_table, target_id = queue.pop()
+            for cell in self.referrers(target_table, [target_id]):
+                if cell.row in pending.get(cell.table, ()):
                     continue
-                for rowi, value in enumerate(table.df[col], start=1):
-                    try:
-                        assert isinstance(value, str)
-                        assert value[0] == '^'
-                        _0, _1 = value[1:].split(':')
-                        assert _0 in self.tables
-                        assert int(_1) in self.tables[_0].df.index
-                    except:
-                        return False, (value, table.name, rowi)
-        return True, None
\ No newline at end of file
+                referrers.append(cell)
+                if cascade:
+                    pending.setdefault(cell.table, set()).add(cell.row)
+                    queue.append((cell.table, cell.row))
+        if referrers and not cascade:
+            return False, referrers
+        for name, rows in pending.items():
+            self.tables[name].delete_rows(sorted(rows))
+        return True, referrers
+
+    def _rewrite_refs(self, cells: list[DBRefCell]):
+        # the index already follows renames and re-ids; write its targets back into the cells
+        groups = {}
+        for cell in cells:
+            groups.setdefault((cell.table, cell.column), []).append(cell.row)
+        for (name, col), rows in groups.items():
+            targets = self.refs.forward[name]
+            values = ['^{}:{}'.format(*targets[row][col]) for row in rows]
+            self.tables[name].update_cells(rows, [col], [values])
+
+    def rename_table(self, table_name: str, new_name: str):
+        # renames the table and every dbref pointing into it
+        with self.write_locked():
+            self.referrers(table_name, [])
+            self.tables[table_name].rename(new_name)
+            self._rewrite_refs([cell for cells in self.refs.reverse.get(new_name, {}).values() for cell in cells])
+            for table in self.tables.values():
+                for col, rules in list(table.constraints.items()):
+                    if rules.get('target') == table_name:
+                        table.set_constraints(col, {**rules, 'target': new_name})
+
+    def reid_rows(self, table_name: str, ids, new_ids):
+        # renumbers rows and every dbref pointing at them
+        with self.write_locked():
+            self.referrers(table_name, [])
+            self.tables[table_name].reid_rows(ids, new_ids)
+            self._rewrite_refs(self.referrers(table_name, new_ids))
+
+    def dbref_keys(self) -> pd.MultiIndex:
+        # every (table, id) pair a dbref may point to
+        names = np.repeat(list(self.tables.keys()), [len(t.df) for t in self.tables.values()])
+        ids = [t.df.index.to_numpy(dtype='int64') for t in self.tables.values()]
+        ids = np.concatenate(ids) if ids else np.empty(0, dtype='int64')
+        return pd.MultiIndex.from_arrays([names.astype(object), ids])
+
+    def find_broken_dbrefs(self, values: pd.Series, keys: pd.MultiIndex | None = None) -> pd.Series:
+        if keys is None:
+            keys = self.dbref_keys()
+        valid = np.zeros(len(values), dtype=bool)
+        try:
+            parts = values.str.extract(DBREF_PATTERN)
+        except AttributeError:
+            # no string values at all
+            return pd.Series(~valid, index=values.index)
+        matched = parts[1].notna().to_numpy()
+        if matched.any():
+            refs = pd.MultiIndex.from_arrays([
+                parts[0][matched].to_numpy(dtype=object),
+                parts[1][matched].astype('int64').to_numpy(),
+            ])
+            valid[matched] = refs.isin(keys)
+        return pd.Series(~valid, index=values.index)
+  
+    @profiled('check_constraints')
+    def check_constraints(self) -> tuple[bool, list[ConstraintViolation]]:
+        violations = self.validator.violations()
+        return not violations, violations
+
+    @profiled('check_integrity')
+    def check_integrity(self) -> tuple[bool, list[DBRefViolation]]:
+        with self.read_locked():
+            keys = self.dbref_keys()
+            violations = []
+            for table in self.tables.values():
+                with PROFILER.phase('check_integrity', table.name):
+                    for col in table.dbref_columns():
+                        values = table.df[col]
+                        broken = self.find_broken_dbrefs(values, keys)
+                        for row, value in values[broken].items():
+                            violations.append(DBRefViolation(value, table.name, col, row))
+        return not violations, violations
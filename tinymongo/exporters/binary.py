@@ -0,0 +1,91 @@
+import json
+from typing import BinaryIO, Iterator
+
+import numpy as np
+import pandas as pd
+
+from tinymongo.db import Database
+from tinymongo.exporters.binary_reader import BINARY_ALIGNMENT, BINARY_HEADER, BINARY_MAGIC, BINARY_TRAILER, BINARY_VERSION
+from tinymongo.profiling import profiled
+
+NUMPY_DTYPES = {
+    'int': '<i8',
+    'float': '<f8',
+    'bool': '?',
+}
+
+def encode_strings(values: pd.Series, pool: dict[str, int]) -> np.ndarray:
+    codes, uniques = pd.factorize(values)
+    ids = [pool.setdefault(str(value), len(pool)) for value in uniques]
+    ids.append(pool[''])    # code -1 (missing) picks the last entry
+    return np.asarray(ids, dtype='<u4')[codes]
+
+def iter_export(self: 'Database') -> Iterator[bytes]:
+    offset = 0
+    def section(data) -> tuple[int, list]:
+        nonlocal offset
+        data = memoryview(data).cast('B')
+        start = offset
+        padding = -len(data) % BINARY_ALIGNMENT
+        offset += len(data) + padding
+        return start, [data, bytes(padding)]
+
+    _, chunks = section(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION))
+    yield from chunks
+
+    pool = {'': 0}
+    tables = []
+    for table in self.tables.values():
+        ids = np.ascontiguousarray(table.df.index.to_numpy(), dtype='<i8')
+        ids_offset, chunks = section(ids)
+        yield from chunks
+
+        columns = []
+        for col, col_type_name in list(table.column_types.items())[1:]:   # skip '?'
+            values = table.df[col]
+            if col_type_name in NUMPY_DTYPES:
+                data = np.ascontiguousarray(values.to_numpy(), dtype=NUMPY_DTYPES[col_type_name])
+            else:
+                data = encode_strings(values, pool)
+            col_offset, chunks = section(data)
+            yield from chunks
+            columns.append({'name': col, 'type': col_type_name, 'offset': col_offset})
+            if col in table.constraints:
+                columns[-1]['constraints'] = table.constraints[col]
+
+        tables.append({
+            'name': table.name,
+            'rows': len(table.df),
+            'next_id': table._next_id,
+            'ids': ids_offset,
+            'columns': columns,
+        })
+
+    encoded = [value.encode() for value in pool]
+    string_offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(value) for value in encoded], out=string_offsets[1:])
+    offsets_offset, chunks = section(string_offsets)
+    yield from chunks
+    data_offset, chunks = section(b''.join(encoded))
+    yield from chunks
+
+    meta = json.dumps({
+        'version': BINARY_VERSION,
+        'name': self.name,
+        'tables': tables,
+        'strings': {'count': len(encoded), 'offsets': offsets_offset, 'data': data_offset},
+    }).encode()
+    meta_offset, chunks = section(meta)
+    yield from chunks
+    yield BINARY_TRAILER.pack(meta_offset, len(meta), BINARY_MAGIC)
+
+@profiled('export_binary')
+def export_to(self: 'Database', fp: BinaryIO) -> int:
+    size = 0
+    for chunk in iter_export(self):
+        size += fp.write(chunk)
+    return size
+
+@profiled('export_binary')
+def export(self: 'Database') -> bytes:
+    return b''.join(iter_export(self))
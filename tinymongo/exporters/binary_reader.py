@@ -0,0 +1,117 @@
+# Reader for the tinymongo binary columnar format.
+# Standard library only: this file is also embedded verbatim into generated db.py modules.
+#
+# Layout (little-endian, every section 8-byte aligned):
+#   b'TMDB' u32 version
+#   per table: ids (int64), then one array per column
+#              int -> int64, float -> float64, bool -> uint8, str/dbref -> uint32 string id
+#   string table: uint64 offsets[count + 1], utf-8 data
+#   json metadata
+#   u64 metadata offset, u64 metadata size, b'TMDB'
+
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Sequence
+
+BINARY_MAGIC = b'TMDB'
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 8
+BINARY_HEADER = struct.Struct('<4sI')
+BINARY_TRAILER = struct.Struct('<QQ4s')
+BINARY_TYPECODES = {'int': 'q', 'float': 'd', 'bool': '?', 'str': 'I', 'dbref': 'I'}
+
+
+class StringColumn(Sequence):
+    def __init__(self, reader: 'BinaryReader', codes):
+        self.reader = reader
+        self.codes = codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.reader.string(code) for code in self.codes[i]]
+        return self.reader.string(self.codes[i])
+
+    def __iter__(self):
+        string = self.reader.string
+        return (string(code) for code in self.codes)
+
+
+class BinaryTable:
+    def __init__(self, reader: 'BinaryReader', meta: dict):
+        self.reader = reader
+        self.name = meta['name']
+        self.next_id = meta['next_id']
+        self._length = meta['rows']
+        self._ids = meta['ids']
+        self._columns = {col['name']: col for col in meta['columns']}
+        self.column_types = {col['name']: col['type'] for col in meta['columns']}
+        self.constraints = {col['name']: col['constraints'] for col in meta['columns'] if 'constraints' in col}
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def ids(self):
+        return self.reader.view(self._ids, self._length, 'q')
+
+    def column(self, name: str):
+        col = self._columns[name]
+        codes = self.reader.view(col['offset'], self._length, BINARY_TYPECODES[col['type']])
+        if col['type'] in ('str', 'dbref'):
+            return StringColumn(self.reader, codes)
+        return codes
+
+    def columns(self) -> list:
+        return [self.column(name) for name in self._columns]
+
+
+class BinaryReader:
+    def __init__(self, source):
+        # `source` is a path (memory-mapped) or any bytes-like object
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(source)
+
+        magic, version = BINARY_HEADER.unpack_from(self.buffer, 0)
+        meta_offset, meta_size, end_magic = BINARY_TRAILER.unpack_from(self.buffer, len(self.buffer) - BINARY_TRAILER.size)
+        if magic != BINARY_MAGIC or end_magic != BINARY_MAGIC:
+            raise ValueError('not a tinymongo binary file')
+        if version > BINARY_VERSION:
+            raise ValueError(f'unsupported tinymongo binary version {version}')
+        meta = json.loads(str(self.buffer[meta_offset:meta_offset+meta_size], 'utf-8'))
+
+        self.version = version
+        self.name = meta['name']
+        self.tables = {t['name']: BinaryTable(self, t) for t in meta['tables']}
+        strings = meta['strings']
+        self.string_count = strings['count']
+        self._string_offsets = self.view(strings['offsets'], strings['count'] + 1, 'Q')
+        self._string_data = strings['data']
+        self._strings = {}
+
+    def view(self, offset: int, count: int, typecode: str):
+        size = struct.calcsize(typecode)
+        view = self.buffer[offset:offset+count*size]
+        if sys.byteorder == 'little' or size == 1:
+            return view.cast(typecode)
+        values = array.array(typecode)     # big-endian hosts pay for a swapped copy
+        values.frombytes(view)
+        values.byteswap()
+        return values
+
+    def string(self, i: int) -> str:
+        # decoded strings are shared, so repeated values cost one object
+        value = self._strings.get(i)
+        if value is None:
+            start = self._string_data + self._string_offsets[i]
+            end = self._string_data + self._string_offsets[i+1]
+            value = self._strings[i] = str(self.buffer[start:end], 'utf-8')
+        return value
@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterator
+
+import pandas as pd
+
+from tinymongo.db import Table
+
+def table_digest(table: 'Table') -> str:
+    # content hash of ids, column names/types and every column except '?'; hashed in the plain dtype
+    # so that the compact width a column happens to have (int16 after a load, int64 after edits) does not matter
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((table.name, list(table.column_types.items()))).encode())
+    h.update(pd.util.hash_pandas_object(table.df.index).to_numpy().tobytes())
+    for col in table.df.columns[1:]:
+        values = table.df[col]
+        dtype = table.get_column_type(col).dtype
+        if values.dtype != 'category' and values.dtype != dtype:
+            values = values.astype(dtype)     # categoricals already hash like their values
+        h.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ExportCache:
+    # LRU of generated source fragments, bounded by their total length
+    def __init__(self, max_size: int = 64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, value: str):
+        if len(value) > self.max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def cached(self, key: Hashable, chunks: Iterator[str]) -> Iterator[str]:
+        entry = self.get(key)
+        if entry is not None:
+            yield entry
+            return
+        parts, size = [], 0
+        for chunk in chunks:
+            yield chunk
+            if parts is not None:
+                parts.append(chunk)
+                size += len(chunk)
+                if size > self.max_size:
+                    parts = None    # too big to keep, just stream it
+        if parts is not None:
+            self.put(key, ''.join(parts))
+
+    def info(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'size': self.size, 'max_size': self.max_size}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+EXPORT_CACHE = ExportCache()
@@ -0,0 +1,57 @@
+import hashlib
+from typing import Callable, Iterator
+
+from tinymongo.db import Database, Table
+
+CHUNK_SIZE = 1000
+
+def iter_row_chunks(table: 'Table', chunk_size: int = CHUNK_SIZE) -> Iterator[list[list]]:
+    df = table.df
+    for start in range(0, len(df), chunk_size):
+        rows = []
+        for row in df.iloc[start:start+chunk_size].itertuples(index=True):
+            row = list(row); del row[1]     # drop the '?' column
+            rows.append(row)
+        yield rows
+
+POOL_NAME = '_S'
+
+class StringPool:
+    # str and dbref values repeated often enough that naming each once and referring to it as _S[i] is shorter;
+    # `entry` is the line declaring one pooled literal and `frame` the length of the code around those lines
+    def __init__(self, db: 'Database', literal: Callable[[str], str], entry: str, frame: int = 0):
+        counts = {}
+        for table in db.tables.values():
+            for col, col_type_name in table.column_types.items():
+                if col_type_name in ('str', 'dbref'):
+                    for value, count in table.df[col].value_counts().items():
+                        if count and isinstance(value, str):
+                            counts[value] = counts.get(value, 0) + count
+        self.strings = []
+        self.references = 0
+        self.saved = 0
+        overhead = len(entry.format(''))
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            size = len(literal(value))
+            saved = count * (size - len(f'{POOL_NAME}[{len(self.strings)}]')) - size - overhead
+            if saved > 0:
+                self.strings.append(value)
+                self.references += count
+                self.saved += saved
+        self.saved -= frame
+        if self.saved <= 0:
+            # too little repetition to pay for the declaration
+            self.strings, self.references, self.saved = [], 0, 0
+        self.index = {value: i for i, value in enumerate(self.strings)}
+        self.digest = hashlib.blake2b('\0'.join(self.strings).encode(), digest_size=16).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def formatter(self, literal: Callable) -> Callable:
+        # `literal` for everything but pooled strings
+        index = self.index
+        def format(value) -> str:
+            i = index.get(value) if type(value) is str else None
+            return literal(value) if i is None else f'{POOL_NAME}[{i}]'
+        return format
@@ -1,19 +1,145 @@
 import keyword
-import pickle as pkl
-import base64
 import json
 from datetime import datetime
+from typing import Iterator, TextIO
 
 from tinymongo.columns import COLUMN_TYPES
-from tinymongo.db import Database
+from tinymongo.constraints import enforce
+from tinymongo.db import Database, Table
+from tinymongo.snapshot import iter_header
+from tinymongo.exporters.cache import EXPORT_CACHE, ExportCache, table_digest
+from tinymongo.exporters.common import CHUNK_SIZE, POOL_NAME, StringPool, iter_row_chunks
+from tinymongo.profiling import profiled, profiled_iter
 
 def to_json(value):
     if isinstance(value, float):
         return '(float)' + repr(value)
     return json.dumps(value, ensure_ascii=False)
 
-def export(self: 'Database') -> str:
-    metadata = base64.b64encode(pkl.dumps(self, protocol=4)).decode()
+INDENT = '            '
+
+POOL_START = f'        private static readonly string[] {POOL_NAME} = {{\n'
+POOL_ENTRY = INDENT + '{},\n'
+POOL_END = '        };\n\n'
+
+def make_string_pool(self: 'Database') -> StringPool:
+    return StringPool(self, to_json, POOL_ENTRY, len(POOL_START) + len(POOL_END))
+
+def pool_report(self: 'Database') -> dict:
+    # what pool=True does to the size of the export
+    pool = make_string_pool(self)
+    return {'strings': len(pool.strings), 'references': pool.references, 'saved': pool.saved}
+
+def iter_table_data(table: 'Table', row_type: str, chunk_size: int, pool: StringPool | None = None) -> Iterator[str]:
+    format = to_json if pool is None else pool.formatter(to_json)
+    table_name_json = to_json(table.name)
+    yield f'''{INDENT}_instance.tables[{table_name_json}] = _instance.{table.name} = new Table<{row_type}>({table_name_json}, new List<{row_type}>{{'''
+    sep = '\n'
+    for rows in iter_row_chunks(table, chunk_size):
+        chunk = []
+        for row in rows:
+            chunk.append(f'{sep}{INDENT}    new {row_type}({", ".join(map(format, row))})')
+            sep = ',\n'
+        yield ''.join(chunk)
+    yield f'\n{INDENT}}});\n'
+
+def iter_data(self: 'Database', all_row_types: dict, chunk_size: int, cache: ExportCache | None,
+              pool: StringPool | None = None) -> Iterator[str]:
+    for i, table in enumerate(self.tables.values()):
+        row_type = all_row_types[table]
+        if i > 0:
+            yield INDENT + '\n'
+        chunks = iter_table_data(table, row_type, chunk_size, pool)
+        key = ('csharp', 'rows', row_type, table_digest(table), pool and pool.digest)
+        chunks = cache.cached(key, chunks) if cache else chunks
+        yield from profiled_iter(chunks, 'export_csharp', table.name)
+
+def iter_row_class(table: 'Table', row_type: str, link: bool = False) -> Iterator[str]:
+    src = []
+    src.append(f'    public class {row_type}: IRow\n')
+    src.append('    {\n')
+    links = []
+
+    variables = {'id': 'int'}
+    for i, col_type_name in enumerate(table.column_types.values()):
+        if i == 0:
+            src.append(f'        public int id;\n')
+            continue
+        col_type = COLUMN_TYPES[col_type_name]
+        col_name = table.df.columns[i]
+        if keyword.iskeyword(col_name):
+            col_name += '_'
+
+        cs_dtypes = {
+            'int': 'int',
+            'float': 'float',
+            'str': 'string',
+            'bool': 'bool',
+            'dbref': 'string'
+        }
+
+        if col_type_name == 'dbref':
+            ref_col_name = '_dbref__' + col_name
+            src.append(f'        public string {ref_col_name};\n')
+            if link:
+                # a plain field, filled in by Link() when the database is loaded
+                src.append(f'        public object {col_name};\n')
+                links.append(f'            this.{col_name} = db.Resolve(this.{ref_col_name}, missing);\n')
+            else:
+                src.append(f'        public object {col_name} => Database.instance.Dereference(this.{ref_col_name});\n')
+            variables[ref_col_name] = cs_dtypes[col_type_name]
+        else:
+            src.append(f'        public {cs_dtypes[col_type_name]} {col_name};\n')
+            variables[col_name] = cs_dtypes[col_type_name]
+
+    src.append(f'\n        public {row_type}({", ".join(f"{v} {k}" for k, v in variables.items())})\n')
+    src.append('        {\n')
+    for k, v in variables.items():
+        src.append(f'            this.{k} = {k};\n')
+    src.append('        }\n')
+
+    src.append('        public int GetId() => this.id;\n')
+    if link:
+        src.append('\n        public void Link(Database db, List<string> missing)\n')
+        src.append('        {\n')
+        src.extend(links)
+        src.append('        }\n')
+    src.append('    }\n\n')
+    yield ''.join(src)
+
+LINK_SRC = '''            var missing = new List<string>();
+            foreach (ITable table in _instance.tables.Values) table.Link(_instance, missing);
+            if (missing.Count > 0) throw new Exception(missing.Count + " dbrefs point to missing rows: " + string.Join(", ", missing));
+'''
+
+LINK_DECL = '''
+        public void Link(Database db, List<string> missing);'''
+
+TABLE_LINK_SRC = '''
+
+        void ITable.Link(Database db, List<string> missing)
+        {
+            foreach (var row in data) row.Link(db, missing);
+        }'''
+
+RESOLVE_SRC = '''
+        public object Resolve(string dbref, List<string> missing)
+        {
+            if(string.IsNullOrEmpty(dbref)) return null;
+            var parts = dbref.Substring(1).Split(':');
+            object ret = tables.TryGetValue(parts[0], out var table) ? ((ITable)table).WithId(int.Parse(parts[1])) : null;
+            if(ret == null) missing.Add(dbref);
+            return ret;
+        }
+'''
+
+def iter_export(self: 'Database', chunk_size: int = CHUNK_SIZE, link: bool = False, pool: bool = False,
+                cache: ExportCache | None = EXPORT_CACHE) -> Iterator[str]:
+    # with `pool`, repeated strings are declared once in a static array and rows index into it
+    enforce(self)
+    string_pool = make_string_pool(self) or None if pool else None
+    yield '// '
+    yield from iter_header(self)
 
     all_row_types = {}
     for table in self.tables.values():
@@ -23,22 +149,7 @@ def export(self: 'Database') -> str:
     for table in self.tables.values():
         db_tables.append(f"        public Table<{all_row_types[table]}> {table.name};")
 
-    # data
-    data_src = []
-    for table in self.tables.values():
-        table_name_json = to_json(table.name)
-        data_repr = [f'new List<{all_row_types[table]}>{{' + '\n']
-        for row in table.df.itertuples(index=True):
-            row = list(row); del row[1]
-            data_repr.append('    ')
-            data_repr.append('new ' + all_row_types[table] + '(' + ', '.join(map(to_json, row)) + ')')
-            data_repr.append(',\n')
-        data_repr[-1] = '\n'    # remove last comma
-        data_repr.append('}')
-        data_src.append(f'''_instance.tables[{table_name_json}] = _instance.{table.name} = new Table<{all_row_types[table]}>({table_name_json}, {''.join(data_repr)});\n''')
-    data_src = [f'            {line}' for line in '\n'.join(data_src).splitlines()]
-
-    src = [f'''// {metadata}      
+    yield f'''      
 // Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 using System;
@@ -52,13 +163,19 @@ namespace TinyMongo.{self.name}
 
         public Dictionary<string, object> tables = new Dictionary<string, object>();
 
-        private static Database _instance;
+'''
+    if string_pool is not None:
+        yield POOL_START + ''.join(POOL_ENTRY.format(to_json(value)) for value in string_pool.strings) + POOL_END
+    yield f'''        private static Database _instance;
 
         public static Database instance {{ get {{
             if (_instance != null) return _instance;
             _instance = new Database();
-{chr(10).join(data_src)}
-            return _instance;
+'''
+    yield from iter_data(self, all_row_types, chunk_size, cache, string_pool)
+    if link:
+        yield LINK_SRC
+    yield f'''            return _instance;
         }} }}
 
         public object Dereference(string dbref)
@@ -71,7 +188,7 @@ namespace TinyMongo.{self.name}
             if(ret == null) throw new Exception("DBRef not found: " + dbref);
             return ret;
         }}
-
+{RESOLVE_SRC if link else ''}
         public string name => {to_json(self.name)};
         public int Count => tables.Count;
         public object this[string name] => tables[name];
@@ -79,12 +196,12 @@ namespace TinyMongo.{self.name}
 
     public interface ITable
     {{
-        public object WithId(int id);
+        public object WithId(int id);{LINK_DECL if link else ''}
     }}
 
     public interface IRow
     {{
-        public int GetId();
+        public int GetId();{LINK_DECL if link else ''}
     }}
 
     public class Table<T>: ITable where T: IRow
@@ -101,53 +218,29 @@ namespace TinyMongo.{self.name}
             foreach (var row in data) this.indexedData.Add(row.GetId(), row);
         }}
 
-        object ITable.WithId(int id) => indexedData.TryGetValue(id, out var row) ? row : null;
+        object ITable.WithId(int id) => indexedData.TryGetValue(id, out var row) ? row : null;{TABLE_LINK_SRC if link else ''}
 
         public int Count => data.Count;
         public T this[int i] => data[i];
     }}
 
-''']
+'''
     
     for table in self.tables.values():
-        src.append(f'    public class {all_row_types[table]}: IRow\n')
-        src.append('    {\n')
-
-        variables = {'id': 'int'}
-        for i, col_type_name in enumerate(table.column_types.values()):
-            if i == 0:
-                src.append(f'        public int id;\n')
-                continue
-            col_type = COLUMN_TYPES[col_type_name]
-            col_name = table.df.columns[i]
-            if keyword.iskeyword(col_name):
-                col_name += '_'
-
-            cs_dtypes = {
-                'int': 'int',
-                'float': 'float',
-                'str': 'string',
-                'bool': 'bool',
-                'dbref': 'string'
-            }
-
-            if col_type_name == 'dbref':
-                ref_col_name = '_dbref__' + col_name
-                src.append(f'        public string {ref_col_name};\n')
-                src.append(f'        public object {col_name} => Database.instance.Dereference(this.{ref_col_name});\n')
-                variables[ref_col_name] = cs_dtypes[col_type_name]
-            else:
-                src.append(f'        public {cs_dtypes[col_type_name]} {col_name};\n')
-                variables[col_name] = cs_dtypes[col_type_name]
-
-        src.append(f'\n        public {all_row_types[table]}({", ".join(f"{v} {k}" for k, v in variables.items())})\n')
-        src.append('        {\n')
-        for k, v in variables.items():
-            src.append(f'            this.{k} = {k};\n')
-        src.append('        }\n')
-
-        src.append('        public int GetId() => this.id;\n')
-        src.append('    }\n\n')
+        row_type = all_row_types[table]
+        chunks = iter_row_class(table, row_type, link)
+        key = ('csharp', 'class', row_type, tuple(table.column_types.items()), tuple(table.df.columns), link)
+        yield from cache.cached(key, chunks) if cache else chunks
     
-    src.append('}')
-    return ''.join(src)
\ No newline at end of file
+    yield '}'
+
+@profiled('export_csharp')
+def export_to(self: 'Database', fp: TextIO, **options) -> int:
+    size = 0
+    for chunk in iter_export(self, **options):
+        size += fp.write(chunk)
+    return size
+
+@profiled('export_csharp')
+def export(self: 'Database', **options) -> str:
+    return ''.join(iter_export(self, **options))
\ No newline at end of file
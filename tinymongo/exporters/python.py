@@ -1,13 +1,145 @@
+import inspect
 import keyword
-import pickle as pkl
-import base64
 from datetime import datetime
+from typing import Iterator, TextIO
 
 from tinymongo.columns import COLUMN_TYPES
-from tinymongo.db import Database
+from tinymongo.constraints import enforce
+from tinymongo.db import Database, Table
+from tinymongo.snapshot import iter_header
+from tinymongo.exporters import binary_reader
+from tinymongo.exporters.cache import EXPORT_CACHE, ExportCache, table_digest
+from tinymongo.exporters.common import CHUNK_SIZE, POOL_NAME, StringPool, iter_row_chunks
+from tinymongo.profiling import profiled, profiled_iter
 
-def export(self: 'Database') -> str:
-    metadata = base64.b64encode(pkl.dumps(self, protocol=4)).decode()
+BINARY_READER_SRC = inspect.getsource(binary_reader)
+
+POOL_START = f'\n{POOL_NAME} = (\n'
+POOL_ENTRY = '    {},\n'
+POOL_END = ')\n'
+
+LAZY_TABLES_SRC = '''
+class LazyTables(Mapping):
+    def __init__(self, loaders: dict, on_load=None):
+        self._loaders = loaders
+        self._on_load = on_load
+        self._tables = {}
+
+    def __getitem__(self, name: str) -> 'Table':
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = self._loaders[name]()
+            if self._on_load is not None:
+                self._on_load([table])
+        return table
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def loaded(self) -> list[str]:
+        return list(self._tables)
+'''
+
+LINK_SRC = '''
+    def link(self, tables: list['Table']):
+        # resolve dbref strings into direct row references, reporting every missing target at once
+        missing = []
+        for table in tables:
+            if not table.data:
+                continue
+            for name, ref_name in table.data[0]._links:
+                for row in table.data:
+                    dbref = getattr(row, ref_name)
+                    target = None
+                    if dbref:
+                        target_table, id = dbref[1:].split(':')
+                        if target_table in self.tables:
+                            target = self.tables[target_table].indexed_data.get(int(id))
+                        if target is None:
+                            missing.append(f'{table.name}.{name}, row {row.id}: {dbref}')
+                    setattr(row, name, target)
+        if missing:
+            raise LookupError(f'{len(missing)} dbrefs point to missing rows: ' + ', '.join(missing[:20]))
+'''
+
+def iter_row_class(table: 'Table', row_type: str, slots: bool, link: bool = False) -> Iterator[str]:
+    src = [f'''
+@dataclass
+class {row_type}(Row):
+''']
+    fields = []
+    links = []
+    empty = True
+    for i, col_type_name in enumerate(table.column_types.values()):
+        if i == 0:
+            src.append(f'    id: int\n')
+            fields.append('id')
+            continue
+        col_type = COLUMN_TYPES[col_type_name]
+        col_name = table.df.columns[i]
+        if keyword.iskeyword(col_name):
+            col_name += '_'
+
+        if col_type_name == 'dbref':
+            ref_col_name = '_dbref__' + col_name
+            src.append(f'    {ref_col_name}: str\n')
+            fields.append(ref_col_name)
+            if link:
+                # a plain attribute, filled in by Database.link()
+                links.append((col_name, ref_col_name))
+                if not slots:
+                    src.append(f'    {col_name} = None\n')
+                empty = False
+                continue
+            src.append(f'''
+    @property
+    def {col_name}(self):
+        if self.{ref_col_name}:
+            return db.dereference(self.{ref_col_name})
+''')
+        else:
+            src.append(f'    {col_name}: {col_type.name}\n')
+            fields.append(col_name)
+
+        empty = False
+
+    if link:
+        src.insert(1, f'    _links = {tuple(links)!r}\n')
+    if slots:
+        # no per-row __dict__; dataclass leaves slot descriptors alone
+        src.insert(1, f'    __slots__ = {tuple(fields) + tuple(name for name, _ in links)!r}\n')
+    elif empty:
+        src.append('    pass\n')
+    yield ''.join(src)
+
+def iter_rows_src(table: 'Table', row_type: str, chunk_size: int, pool: StringPool | None = None) -> Iterator[str]:
+    if pool is None:
+        for rows in iter_row_chunks(table, chunk_size):
+            yield ''.join(f'    {row_type}{tuple(row)!r},\n' for row in rows)
+        return
+    format = pool.formatter(repr)
+    for rows in iter_row_chunks(table, chunk_size):
+        yield ''.join(f'    {row_type}({", ".join(map(format, row))}),\n' for row in rows)
+
+def make_string_pool(self: 'Database') -> StringPool:
+    return StringPool(self, repr, POOL_ENTRY, len(POOL_START) + len(POOL_END))
+
+def pool_report(self: 'Database') -> dict:
+    # what pool=True does to the size of the export
+    pool = make_string_pool(self)
+    return {'strings': len(pool.strings), 'references': pool.references, 'saved': pool.saved}
+
+def iter_export(self: 'Database', chunk_size: int = CHUNK_SIZE, slots: bool = False, lazy: bool = False,
+                data_file: str | None = None, link: bool = False, pool: bool = False,
+                cache: ExportCache | None = EXPORT_CACHE) -> Iterator[str]:
+    # with `pool`, repeated strings are declared once in a tuple and rows index into it
+    enforce(self)
+    string_pool = None if data_file or not pool else make_string_pool(self) or None
+    yield '# '
+    yield from iter_header(self)
 
     all_row_types = {}
     for table in self.tables.values():
@@ -17,13 +149,25 @@ def export(self: 'Database') -> str:
     for table in self.tables.values():
         db_tables.append(f"    {table.name}: 'Table[{all_row_types[table]}]'")
 
-    src = [f'''# {metadata}      
+    yield f'''      
 # Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             
+import operator
+import os
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
 from dataclasses import dataclass
 from typing import Generic, TypeVar
             
-T = TypeVar('T', bound='Table')
+T = TypeVar('T', bound='Row')
+
+_RANGE_OPS = {{
+    'eq': operator.eq,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'gte': operator.ge,
+}}
 
 class Database:
 {chr(10).join(db_tables)}
@@ -38,6 +182,16 @@ class Database:
     def __getitem__(self, name: str) -> 'Table':
         return self.tables[name]
 
+    def __getattr__(self, name: str) -> 'Table':
+        if name == 'tables':
+            raise AttributeError(name)
+        try:
+            table = self.tables[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        setattr(self, name, table)
+        return table
+
     def dereference(self, dbref: str) -> {' | '.join(all_row_types.values())!r}:
         table, id = dbref[1:].split(':')
         return self.tables[table].indexed_data[int(id)]
@@ -45,6 +199,9 @@ class Database:
     @property
     def name(self):
         return {self.name!r}
+{LINK_SRC if link else ''}{LAZY_TABLES_SRC if lazy else ''}
+class Row:
+    __slots__ = ()
 
 class Table(Generic[T]):
     data: list['T']
@@ -54,6 +211,8 @@ class Table(Generic[T]):
         self.name = name
         self.data = data
         self.indexed_data = {{row.id: row for row in data}}
+        self._hash_indexes = {{}}
+        self._sorted_indexes = {{}}
         
     def __len__(self):
         return len(self.data)
@@ -68,61 +227,145 @@ class Table(Generic[T]):
         assert type(id) is int
         return self.indexed_data.get(id)
 
+    def reindex(self):
+        self.indexed_data = {{row.id: row for row in self.data}}
+        self._hash_indexes.clear()
+        self._sorted_indexes.clear()
+
+    def _hash_index(self, key: str) -> dict | None:
+        if key not in self._hash_indexes:
+            index = {{}}
+            try:
+                for row in self.data:
+                    index.setdefault(getattr(row, key), []).append(row)
+            except TypeError:
+                index = None    # unhashable values, e.g. dereferenced rows
+            self._hash_indexes[key] = index
+        return self._hash_indexes[key]
+
+    def _sorted_index(self, key: str) -> tuple[list, list[int]] | None:
+        if key not in self._sorted_indexes:
+            items = [(getattr(row, key), i) for i, row in enumerate(self.data)]
+            items = [item for item in items if item[0] == item[0]]     # NaN never matches
+            try:
+                items.sort(key=lambda item: item[0])
+                index = [item[0] for item in items], [item[1] for item in items]
+            except TypeError:
+                index = None
+            self._sorted_indexes[key] = index
+        return self._sorted_indexes[key]
+
+    def _candidates(self, key: str, op: str, value) -> list['T'] | None:
+        if op == 'eq':
+            index = self._hash_index(key)
+            if index is None:
+                return None
+            try:
+                return index.get(value, [])
+            except TypeError:
+                return None
+        index = self._sorted_index(key)
+        if index is None:
+            return None
+        keys, positions = index
+        try:
+            if op == 'lt':
+                positions = positions[:bisect_left(keys, value)]
+            elif op == 'lte':
+                positions = positions[:bisect_right(keys, value)]
+            elif op == 'gt':
+                positions = positions[bisect_right(keys, value):]
+            else:
+                positions = positions[bisect_left(keys, value):]
+        except TypeError:
+            return None
+        return [self.data[i] for i in sorted(positions)]
+
     def objects(self, **queries) -> list['T']:
+        # `col=v` is served from a hash index, `col__lt/lte/gt/gte=v` from a sorted one.
+        # Indexes are built on first use; call reindex() after mutating `data`.
+        predicates = []
+        for query, value in queries.items():
+            key, sep, op = query.rpartition('__')
+            if not sep or op not in _RANGE_OPS:
+                key, op = query, 'eq'
+            predicates.append((key, op, value))
+
+        rows = self.data
+        for key, op, value in predicates:
+            candidates = self._candidates(key, op, value)
+            if candidates is not None and len(candidates) < len(rows):
+                rows = candidates
+                if not rows:
+                    break
+
         results = []
-        for row in self.data:
-            for k, v in queries.items():
-                if getattr(row, k) != v:
+        for row in rows:
+            for key, op, value in predicates:
+                if not _RANGE_OPS[op](getattr(row, key), value):
                     break
             else:
                 results.append(row)
         return results
-''']
+'''
     
     for table in self.tables.values():  
-        src.append(
-f'''
-@dataclass
-class {all_row_types[table]}(Table):
-''')
-        empty = True
-        for i, col_type_name in enumerate(table.column_types.values()):
-            if i == 0:
-                src.append(f'    id: int\n')
-                continue
-            col_type = COLUMN_TYPES[col_type_name]
-            col_name = table.df.columns[i]
-            if keyword.iskeyword(col_name):
-                col_name += '_'
-
-            if col_type_name == 'dbref':
-                ref_col_name = '_dbref__' + col_name
-                src.append(f'    {ref_col_name}: str\n')
-                src.append(f'''
-    @property
-    def {col_name}(self):
-        if self.{ref_col_name}:
-            return db.dereference(self.{ref_col_name})
-''')
-            else:
-                src.append(f'    {col_name}: {col_type.name}\n')
-
-            empty = False
-
-        if empty:
-            src.append('    pass\n')
+        row_type = all_row_types[table]
+        chunks = iter_row_class(table, row_type, slots, link)
+        key = ('python', 'class', row_type, tuple(table.column_types.items()), tuple(table.df.columns), slots, link)
+        yield from cache.cached(key, chunks) if cache else chunks
     
-    src.append('\n\ndb = Database()\n')
+    if data_file:
+        yield '\n\n' + BINARY_READER_SRC
+        yield f'\n_reader = BinaryReader(os.path.join(os.path.dirname(__file__), {data_file!r}))\n'
+
+    yield '\n\ndb = Database()\n'
+    if string_pool is not None:
+        yield POOL_START + ''.join(POOL_ENTRY.format(repr(value)) for value in string_pool.strings) + POOL_END
     
     for table in self.tables.values():
-        data_repr = ['[\n']
-        for row in table.df.itertuples(index=True):
-            row = list(row); del row[1]
-            data_repr.append('    ')
-            data_repr.append(all_row_types[table] + repr(tuple(row)))
-            data_repr.append(',\n')
-        data_repr.append(']')
-        src.append(f'''
-db.{table.name} = db.tables[{table.name!r}] = Table({table.name!r}, {''.join(data_repr)})
-''')
-    return ''.join(src)
+        row_type = all_row_types[table]
+        if data_file:
+            # rows are read column-wise from the memory-mapped data file
+            yield f'''
+def _load_{table.name}():
+    columns = _reader.tables[{table.name!r}]
+    return Table({table.name!r}, list(map({row_type}, columns.ids, *columns.columns())))
+'''
+            if not lazy:
+                yield f'''
+db.{table.name} = db.tables[{table.name!r}] = _load_{table.name}()
+'''
+            continue
+        if lazy:
+            # rows are only built when the table is first looked up
+            yield f'''
+def _load_{table.name}():
+    return Table({table.name!r}, [
+'''
+        else:
+            yield f'''
+db.{table.name} = db.tables[{table.name!r}] = Table({table.name!r}, [
+'''
+        chunks = iter_rows_src(table, row_type, chunk_size, string_pool)
+        key = ('python', 'rows', row_type, table_digest(table), string_pool and string_pool.digest)
+        chunks = cache.cached(key, chunks) if cache else chunks
+        yield from profiled_iter(chunks, 'export_python', table.name)
+        yield '])\n'
+
+    if lazy:
+        loaders = ', '.join(f'{table.name!r}: _load_{table.name}' for table in self.tables.values())
+        yield f'\ndb.tables = LazyTables({{{loaders}}}{", db.link" if link else ""})\n'
+    elif link:
+        yield '\ndb.link(list(db.tables.values()))\n'
+
+@profiled('export_python')
+def export_to(self: 'Database', fp: TextIO, **options) -> int:
+    size = 0
+    for chunk in iter_export(self, **options):
+        size += fp.write(chunk)
+    return size
+
+@profiled('export_python')
+def export(self: 'Database', **options) -> str:
+    return ''.join(iter_export(self, **options))
@@ -0,0 +1,83 @@
+import os
+from typing import IO
+
+import pandas as pd
+from pandas.api import types
+
+from tinymongo.columns import COLUMN_TYPES
+from tinymongo.db import DBREF_PATTERN, DBRefViolation, Table
+
+TRUE_STRINGS = ['true', 'yes', 'y', '1']
+
+READERS = {
+    '.csv': pd.read_csv,
+    '.json': pd.read_json,
+    '.jsonl': lambda fp: pd.read_json(fp, lines=True),
+    '.xlsx': pd.read_excel,     # needs openpyxl
+    '.xls': pd.read_excel,
+}
+
+def read_frame(fp: IO, file_name: str) -> pd.DataFrame:
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f'unsupported file type {ext!r}')
+    df = READERS[ext](fp)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df
+
+def infer_column_type(values: pd.Series) -> str:
+    if types.is_bool_dtype(values):
+        return 'bool'
+    if types.is_integer_dtype(values):
+        return 'int'
+    present = values.dropna()
+    if types.is_float_dtype(values):
+        # integer columns with blanks come back as float
+        return 'int' if len(present) and (present % 1 == 0).all() else 'float'
+    present = present.astype(str)
+    if len(present) and present.str.match(DBREF_PATTERN).all():
+        return 'dbref'
+    if len(present) and present.str.lower().isin(['true', 'false']).all():
+        return 'bool'
+    return 'str'
+
+def coerce_column(values: pd.Series, col_type_name: str) -> pd.Series:
+    col_type = COLUMN_TYPES[col_type_name]
+    if col_type_name in ('int', 'float'):
+        values = pd.to_numeric(values, errors='coerce').fillna(col_type.default)
+    elif col_type_name == 'bool':
+        if types.is_numeric_dtype(values):
+            values = values.fillna(0).astype(bool)
+        else:
+            values = values.astype(str).str.strip().str.lower().isin(TRUE_STRINGS) & values.notna()
+    else:
+        values = values.where(values.notna(), '').astype(str)
+    return values.astype(col_type.dtype)
+
+def import_rows(table: Table, df: pd.DataFrame, column_types: dict[str, str] | None = None) -> tuple[pd.Index, list[DBRefViolation]]:
+    # append every row of `df` to `table`, adding missing columns with the given or inferred type
+    # rows get new ids, so an exported id column is dropped like the selection column
+    column_types = column_types or {}
+    df = df.drop(columns=['?', 'id'], errors='ignore')
+    for col in df.columns:
+        if not col.isidentifier():
+            raise ValueError(f'invalid column name {col!r}')
+    for col in df.columns:
+        if col not in table.column_types:
+            table.add_column(col, column_types.get(col) or infer_column_type(df[col]))
+
+    rows = table.new_rows(len(df))
+    for col in df.columns:
+        rows[col] = coerce_column(df[col], table.column_types[col]).to_numpy()
+    table.insert_rows(rows)
+
+    # checked after inserting, so rows may refer to each other
+    keys = table.db.dbref_keys()
+    violations = []
+    for col in df.columns:
+        if table.column_types[col] == 'dbref':
+            values = rows[col]
+            broken = table.db.find_broken_dbrefs(values, keys)
+            for row, value in values[broken].items():
+                violations.append(DBRefViolation(value, table.name, col, row))
+    return rows.index, violations
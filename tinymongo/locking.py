@@ -0,0 +1,66 @@
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+
+class RWLock:
+    # many readers or one writer; both re-enter, and the writer may also read. waiting writers hold off new readers
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer: int | None = None
+        self._depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, 'reads', 0)
+        with self._cond:
+            nested = self._writer == me or depth > 0
+            if not nested:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+        self._local.reads = depth + 1
+        try:
+            yield
+        finally:
+            self._local.reads = depth
+            if not nested:
+                with self._cond:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._waiting_writers -= 1
+                self._writer = me
+            self._depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._depth -= 1
+                if not self._depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+def locked(mode: str) -> Callable:
+    # run the decorated Table method under its lock, `mode` being 'read' or 'write'
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            with getattr(self.lock, mode)():
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,105 @@
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, TextIO
+
+logger = logging.getLogger('tinymongo.profiling')
+
+WINDOW = 200
+PERCENTILES = (50, 90, 99)
+
+
+class Profiler:
+    # rolling timings per (phase, table); does nothing until `enabled` is set
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._samples: dict[tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        # per thread, so that each app session, running in its own thread, profiles only its own work
+        return getattr(self._local, 'enabled', False)
+
+    @enabled.setter
+    def enabled(self, value: bool):
+        self._local.enabled = value
+
+    def record(self, phase: str, seconds: float, table: str = ''):
+        with self._lock:
+            samples = self._samples.get((phase, table))
+            if samples is None:
+                samples = self._samples[(phase, table)] = deque(maxlen=self.window)
+            samples.append(seconds)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({'phase': phase, 'table': table, 'ms': seconds * 1000}))
+
+    @contextmanager
+    def phase(self, phase: str, table: str = ''):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start, table)
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            items = [(key, sorted(samples)) for key, samples in self._samples.items()]
+        stats = []
+        for (phase, table), samples in sorted(items):
+            stat = {'phase': phase, 'table': table, 'count': len(samples), 'mean_ms': sum(samples) / len(samples) * 1000}
+            for p in PERCENTILES:
+                stat[f'p{p}_ms'] = samples[min(len(samples) - 1, len(samples) * p // 100)] * 1000
+            stat['max_ms'] = samples[-1] * 1000
+            stats.append(stat)
+        return stats
+
+    def dump(self, fp: TextIO):
+        # one json object per line
+        for stat in self.stats():
+            fp.write(json.dumps(stat) + '\n')
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+PROFILER = Profiler()
+
+def profiled(phase: str, per_table: bool = False) -> Callable:
+    # time every call of the decorated function; with `per_table`, its first argument is a Table
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+            with PROFILER.phase(phase, args[0].name if per_table else ''):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def profiled_iter(iterable, phase: str, table: str = ''):
+    # times only the work of producing the items, not what the consumer does with them
+    if not PROFILER.enabled:
+        return iterable
+    def timed():
+        it = iter(iterable)
+        total = 0.0
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                break
+            finally:
+                total += time.perf_counter() - start
+            yield item
+        PROFILER.record(phase, total, table)
+    return timed()
@@ -0,0 +1,225 @@
+# Mongo-style queries over Table frames, evaluated as vectorized masks.
+#
+#   {'hp': {'$gte': 10, '$lt': 20}, 'name': {'$regex': '^sw', '$options': 'i'}}
+#   {'$or': [{'kind': {'$in': ['a', 'b']}}, {'id': 1001}]}
+#   {'item.name': 'sword'}      # follows the dbref column `item` into whatever tables it points at
+
+import re
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from tinymongo.db import Table
+
+RANGE_OPS = ('$eq', '$lt', '$lte', '$gt', '$gte')
+
+
+class QueryError(ValueError):
+    pass
+
+
+def value_kind(value) -> str | None:
+    if isinstance(value, str):
+        return 'str'
+    if isinstance(value, (int, float, np.number)):
+        return 'number'
+    return None
+
+class SortedIndex:
+    # a sorted copy of the non-missing values of one column; equality and range conditions become binary searches
+    def __init__(self, values: pd.Series):
+        self.kind = 'number' if pd.api.types.is_numeric_dtype(values.dtype) else 'str'
+        values = values.to_numpy()
+        present = np.flatnonzero(~pd.isna(values))
+        try:
+            self.order = present[np.argsort(values[present], kind='stable')]
+        except TypeError:
+            self.kind, self.order = None, present   # mixed values, only the mask can compare them
+        self.keys = values[self.order]
+
+    def positions(self, op: str, value) -> np.ndarray | None:
+        # None when the index cannot answer exactly like the mask would, e.g. a string against an int column
+        if self.kind is None or value_kind(value) != self.kind:
+            return None
+        keys = self.keys
+        try:
+            if op == '$eq':
+                lo, hi = np.searchsorted(keys, value, 'left'), np.searchsorted(keys, value, 'right')
+            elif op == '$lt':
+                lo, hi = 0, np.searchsorted(keys, value, 'left')
+            elif op == '$lte':
+                lo, hi = 0, np.searchsorted(keys, value, 'right')
+            elif op == '$gt':
+                lo, hi = np.searchsorted(keys, value, 'right'), len(keys)
+            else:
+                lo, hi = np.searchsorted(keys, value, 'left'), len(keys)
+        except (TypeError, OverflowError):
+            return None     # value not comparable with the column
+        return self.order[lo:hi]
+
+def column_index(table: 'Table', key: str) -> SortedIndex | None:
+    # declared indexes are built on first use and rebuilt after the table changes
+    if key not in table.indexes or key not in table.df.columns:
+        return None
+    entry = table.indexes[key]
+    if entry is None or entry[0] != table.version:
+        entry = table.indexes[key] = (table.version, SortedIndex(table.df[key]))
+    return entry[1]
+
+def field_values(table: 'Table', key: str) -> pd.Series:
+    if key == 'id':
+        return pd.Series(table.df.index, index=table.df.index)
+    if key not in table.df.columns:
+        raise QueryError(f'unknown field {key!r} in table {table.name}')
+    return table.df[key]
+
+def apply(values: pd.Series, fn) -> np.ndarray:
+    # categorical columns are tested once per distinct value
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        hits = np.append(np.asarray(fn(pd.Series(values.cat.categories)), dtype=bool), False)
+        return hits[values.cat.codes.to_numpy()]     # code -1 picks the trailing False
+    return np.asarray(fn(values), dtype=bool)
+
+def contains(values: pd.Series, pattern: str, flags: int = 0) -> pd.Series:
+    # matched with python's re like the pattern was validated; arrow strings would use RE2, whose \w and \d are ascii only
+    return values.astype(str).astype(object).str.contains(pattern, flags=flags, regex=True)
+
+def evaluate_op(table: 'Table', key: str, op: str, value, cond: dict) -> np.ndarray:
+    n = len(table.df)
+    if op in ('$in', '$nin') and not isinstance(value, list):
+        raise QueryError(f'{op} of {key!r} needs a list, not {value!r}')
+    if op == '$regex' and not isinstance(value, str):
+        raise QueryError(f'$regex of {key!r} needs a string, not {value!r}')
+    if op in RANGE_OPS or op == '$in':
+        index = column_index(table, key)
+        if index is not None:
+            positions = [index.positions('$eq', v) for v in value] if op == '$in' else [index.positions(op, value)]
+            if all(p is not None for p in positions):
+                mask = np.zeros(n, dtype=bool)
+                for p in positions:
+                    mask[p] = True
+                return mask
+
+    if op == '$exists':
+        return np.full(n, (key == 'id' or key in table.df.columns) == bool(value))
+    if op == '$options':
+        return np.ones(n, dtype=bool)   # read by $regex
+    if op == '$not':
+        return ~evaluate_field(table, key, value)
+
+    values = field_values(table, key)
+    if op in ('$eq', '$ne') and isinstance(value, (list, dict)):
+        raise QueryError(f'cannot compare {key!r} with {value!r}')
+    if op == '$eq':
+        return apply(values, lambda v: v == value)
+    if op == '$ne':
+        return apply(values, lambda v: v != value)
+    if op == '$in':
+        return apply(values, lambda v: v.isin(list(value)))
+    if op == '$nin':
+        return apply(values, lambda v: ~v.isin(list(value)))
+    if op == '$regex':
+        options = cond.get('$options', '')
+        if not isinstance(options, str):
+            raise QueryError(f'$options of {key!r} needs a string, not {options!r}')
+        flags = re.IGNORECASE if 'i' in options else 0
+        try:
+            re.compile(value, flags)
+        except re.error as e:
+            raise QueryError(f'invalid $regex {value!r}: {e}') from e
+        return apply(values, lambda v: contains(v, value, flags))
+    try:
+        if op == '$gt':
+            return apply(values, lambda v: v > value)
+        if op == '$gte':
+            return apply(values, lambda v: v >= value)
+        if op == '$lt':
+            return apply(values, lambda v: v < value)
+        if op == '$lte':
+            return apply(values, lambda v: v <= value)
+    except (TypeError, ValueError) as e:
+        raise QueryError(f'cannot compare {key!r} with {value!r}') from e
+    raise QueryError(f'unknown operator {op!r}')
+
+def evaluate_join(table: 'Table', key: str, cond) -> np.ndarray:
+    # `col.field`: rows whose dbref in `col` points at a row matching `field`
+    col, rest = key.split('.', 1)
+    if table.column_types.get(col) != 'dbref':
+        raise QueryError(f'{col!r} in table {table.name} is not a dbref column')
+    refs = []
+    for target in table.db.tables.values():
+        field = rest.split('.', 1)[0]
+        if field != 'id' and field not in target.df.columns:
+            continue
+        ids = target.df.index[evaluate_field(target, rest, cond)]
+        refs.extend(f'^{target.name}:{row_id}' for row_id in ids)
+    return apply(table.df[col], lambda v: v.isin(refs))
+
+def evaluate_field(table: 'Table', key: str, cond) -> np.ndarray:
+    if '.' in key:
+        return evaluate_join(table, key, cond)
+    if not (isinstance(cond, dict) and cond and all(op.startswith('$') for op in cond)):
+        cond = {'$eq': cond}
+    mask = np.ones(len(table.df), dtype=bool)
+    for op, value in cond.items():
+        mask &= evaluate_op(table, key, op, value, cond)
+    return mask
+
+def evaluate(table: 'Table', filter: dict) -> np.ndarray:
+    if not isinstance(filter, dict):
+        raise QueryError('a filter must be a dict')
+    mask = np.ones(len(table.df), dtype=bool)
+    for key, cond in filter.items():
+        if key in ('$and', '$or', '$nor') and not isinstance(cond, list):
+            raise QueryError(f'{key} needs a list of filters, not {cond!r}')
+        if key == '$and':
+            for sub in cond:
+                mask &= evaluate(table, sub)
+        elif key in ('$or', '$nor'):
+            any_mask = np.zeros(len(table.df), dtype=bool)
+            for sub in cond:
+                any_mask |= evaluate(table, sub)
+            mask &= any_mask if key == '$or' else ~any_mask
+        elif key.startswith('$'):
+            raise QueryError(f'unknown operator {key!r}')
+        else:
+            mask &= evaluate_field(table, key, cond)
+    return mask
+
+def projected_columns(table: 'Table', projection) -> list[str]:
+    columns = [col for col in table.df.columns if col != '?']
+    if projection is None:
+        return columns
+    if isinstance(projection, dict):
+        included = [col for col, flag in projection.items() if flag and col != 'id']
+        excluded = {col for col, flag in projection.items() if not flag}
+        if included:
+            return included
+        return [col for col in columns if col not in excluded]
+    return [col for col in projection if col != 'id']
+
+def plain(values: pd.Series) -> pd.Series:
+    # categories are not kept in order, so sort by the values themselves
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(values.cat.categories.dtype)
+    return values
+
+def find(table: 'Table', filter: dict | None = None, projection=None, sort=None, limit: int | None = None) -> pd.DataFrame:
+    df = table.df[evaluate(table, filter or {})]
+    if sort:
+        if isinstance(sort, str):
+            sort = [(sort, 1)]
+        elif isinstance(sort, dict):
+            sort = list(sort.items())
+        df = df.rename_axis('id').sort_values([col for col, _ in sort], ascending=[direction > 0 for _, direction in sort],
+                                              kind='stable', key=plain).rename_axis(None)
+    if limit:
+        df = df.iloc[:limit]
+    columns = projected_columns(table, projection)
+    unknown = [col for col in columns if col not in table.df.columns]
+    if unknown:
+        raise QueryError(f'unknown fields {unknown} in table {table.name}')
+    dtypes = table.dtypes()
+    return df[columns].astype({col: dtypes[col] for col in columns})
@@ -0,0 +1,182 @@
+import bisect
+import heapq
+import re
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from tinymongo.db import Database, Table
+
+# words, with each CJK character a token of its own since those texts have no spaces
+TOKEN_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]|[^\W_\u3400-\u9fff\uf900-\ufaff]+')
+TEXT_TYPES = ('str', 'dbref')
+
+
+class SearchHit(NamedTuple):
+    table: str
+    row: int
+    column: str
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class TextIndex:
+    # inverted index over the str and dbref cells of every table: token -> cells containing it
+    # built on first use, then kept up to date from table events
+    def __init__(self, db: 'Database'):
+        self.db = db
+        self.built = False
+        self.cells: dict[str, dict[str, dict[int, tuple[str, ...]]]] = {}     # table -> column -> row -> tokens
+        # token -> number of tokens in the cell -> cells; dicts keep cells in insertion order and give ranked lookups
+        self.postings: dict[str, dict[int, dict[tuple[str, int, str], None]]] = {}
+        self._vocabulary: list[str] | None = None                           # sorted tokens, for prefix lookups
+
+    def build(self):
+        self.cells.clear()
+        self.postings.clear()
+        self._vocabulary = None
+        for table in self.db.tables.values():
+            self._add(table, None, self.text_columns(table))
+        self.built = True
+
+    @staticmethod
+    def text_columns(table: 'Table', columns=None) -> list[str]:
+        return [col for col in (table.df.columns if columns is None else columns) if table.column_types.get(col) in TEXT_TYPES]
+
+    def _post(self, tokens: tuple[str, ...], hit: tuple[str, int, str]):
+        for token in tokens:
+            buckets = self.postings.get(token)
+            if buckets is None:
+                buckets = self.postings[token] = {}
+                self._vocabulary = None
+            buckets.setdefault(len(tokens), {})[hit] = None
+
+    def _unpost(self, tokens: tuple[str, ...], hit: tuple[str, int, str]):
+        for token in tokens:
+            buckets = self.postings[token]
+            bucket = buckets[len(tokens)]
+            del bucket[hit]
+            if not bucket:
+                del buckets[len(tokens)]
+                if not buckets:
+                    del self.postings[token]
+                    self._vocabulary = None
+
+    def _add(self, table: 'Table', ids, columns: list[str]):
+        # `ids` None adds every row
+        for col in columns:
+            cells = self.cells.setdefault(table.name, {}).setdefault(col, {})
+            values = table.df[col] if ids is None else table.df.loc[ids, col]
+            memo = {}
+            for row, value in zip(values.index.tolist(), values.tolist()):
+                if value is None or value != value:
+                    continue
+                tokens = memo.get(value)
+                if tokens is None:
+                    tokens = memo[value] = tuple(dict.fromkeys(tokenize(str(value))))
+                if tokens:
+                    cells[row] = tokens
+                    self._post(tokens, (table.name, row, col))
+
+    def _remove(self, table_name: str, ids=None, columns: list[str] | None = None):
+        # `ids` None removes every row
+        table_cells = self.cells.get(table_name, {})
+        for col in list(table_cells) if columns is None else columns:
+            cells = table_cells.get(col)
+            if not cells:
+                continue
+            for row in list(cells) if ids is None else ids:
+                tokens = cells.pop(row, None)
+                if tokens is not None:
+                    self._unpost(tokens, (table_name, row, col))
+
+    def _move(self, table_name: str, old_name: str, id_map: dict[int, int]):
+        # relabel the cells of `old_name` as `table_name` with ids mapped through `id_map`
+        table_cells = self.cells.pop(old_name, {})
+        # new ids may be old ids of other rows, so every cell is taken out before any is put back
+        for col, cells in table_cells.items():
+            for row, tokens in cells.items():
+                self._unpost(tokens, (old_name, row, col))
+        moved = {}
+        for col, cells in table_cells.items():
+            moved[col] = {id_map.get(row, row): tokens for row, tokens in cells.items()}
+            for row, tokens in moved[col].items():
+                self._post(tokens, (table_name, row, col))
+        self.cells[table_name] = moved
+
+    def __call__(self, event: str, table: 'Table', **kwargs):
+        if not self.built:
+            return
+        if event == 'insert_rows':
+            self._add(table, kwargs['ids'], self.text_columns(table))
+        elif event == 'delete_rows':
+            self._remove(table.name, kwargs['ids'])
+        elif event == 'update_cells':
+            columns = self.text_columns(table, kwargs['columns'])
+            self._remove(table.name, kwargs['ids'], columns)
+            self._add(table, kwargs['ids'], columns)
+        elif event == 'add_column':
+            self._add(table, None, self.text_columns(table, [kwargs['column']]))
+        elif event == 'drop_column':
+            self._remove(table.name, None, [kwargs['column']])
+            self.cells.get(table.name, {}).pop(kwargs['column'], None)
+        elif event == 'replace_table':
+            self._remove(table.name)
+            self.cells.pop(table.name, None)
+            self._add(table, None, self.text_columns(table))
+        elif event == 'reid_rows':
+            self._move(table.name, table.name, dict(zip(kwargs['ids'], kwargs['new_ids'])))
+        elif event == 'rename_table':
+            self._move(table.name, kwargs['old_name'], {})
+        elif event == 'drop_table':
+            self._remove(table.name)
+            self.cells.pop(table.name, None)
+
+    def _prefixed(self, prefix: str) -> list[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + '\U0010ffff', start)
+        return vocabulary[start:end]
+
+    def _count(self, tokens: list[str]) -> int:
+        return sum(len(bucket) for token in tokens for bucket in self.postings.get(token, {}).values())
+
+    def search(self, text: str, limit: int = 100) -> list[SearchHit]:
+        # cells containing every word of `text`, the last one possibly unfinished;
+        # whole-word matches of it rank first, then shorter cells, then cells in index order
+        tokens = list(dict.fromkeys(tokenize(text)))
+        if not tokens:
+            return []
+        *words, last = tokens
+        groups = [[last] if last in self.postings else [], [token for token in self._prefixed(last) if token != last]]
+        counts = {word: self._count([word]) for word in words}
+        if words and min(counts.values()) == 0:
+            return []
+        driver = min(words, key=counts.get) if words else None
+
+        def matches(hit) -> bool:
+            cell = self.cells[hit[0]][hit[2]][hit[1]]
+            return all(word in cell for word in words) and any(token.startswith(last) for token in cell)
+
+        if driver is not None and counts[driver] < self._count(groups[0] + groups[1]):
+            # fewer cells hold the rarest other word, so rank all of those
+            def rank(hit):
+                cell = self.cells[hit[0]][hit[2]][hit[1]]
+                return last not in cell, len(cell)
+            hits = [hit for bucket in self.postings[driver].values() for hit in bucket if matches(hit)]
+            return [SearchHit(*hit) for hit in heapq.nsmallest(limit, hits, key=rank)]
+
+        # otherwise walk the cells of the last word in rank order and stop once `limit` are found
+        found = {}
+        for group in groups:
+            for length in sorted({length for token in group for length in self.postings[token]}):
+                for token in group:
+                    for hit in self.postings[token].get(length, ()):
+                        if hit not in found and (not words or matches(hit)):
+                            found[hit] = None
+                            if len(found) == limit:
+                                return [SearchHit(*hit) for hit in found]
+        return [SearchHit(*hit) for hit in found]
@@ -0,0 +1,182 @@
+import base64
+import io
+import pickle as pkl
+import zlib
+from typing import BinaryIO, Iterator
+
+import numpy as np
+import pandas as pd
+
+from tinymongo.constraints import validate_rules
+from tinymongo.db import Database
+from tinymongo.exporters import binary
+from tinymongo.exporters.binary_reader import BinaryReader
+
+# header line: `# tinymongo-snapshot:1:<base64 of zlib-compressed binary columnar data>`
+SNAPSHOT_MAGIC = b'tinymongo-snapshot:1:'
+HEADER_COMMENTS = (b'# ', b'// ')
+CHUNK_SIZE = 64 * 1024
+
+def iter_snapshot(db: 'Database', level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level)
+    for chunk in binary.iter_export(db):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def dump(db: 'Database', fp: BinaryIO) -> int:
+    size = 0
+    for chunk in iter_snapshot(db):
+        size += fp.write(chunk)
+    return size
+
+def from_binary(reader: BinaryReader) -> 'Database':
+    db = Database(reader.name)
+    strings = np.array([reader.string(i) for i in range(reader.string_count)], dtype=object)
+    for t in reader.tables.values():
+        db.create_table(t.name)
+        table = db.tables[t.name]
+        data = {'?': np.zeros(len(t), dtype=bool)}
+        for col, col_type_name in t.column_types.items():
+            if col_type_name in binary.NUMPY_DTYPES:
+                data[col] = np.array(t.column(col))     # copy out of the buffer
+            else:
+                data[col] = strings[np.asarray(t.column(col).codes)]
+        table.column_types = {'?': 'bool', **t.column_types}
+        table.df = pd.DataFrame(data, index=pd.Index(np.array(t.ids), dtype='int64'))
+        table.compact()
+        table._next_id = t.next_id
+        table.constraints = checked_constraints(table.column_types, t.constraints)
+    return db
+
+def checked_constraints(column_types: dict, constraints) -> dict:
+    # rules read from a file get the checks Table.set_constraints makes
+    if not isinstance(constraints, dict):
+        raise ValueError(f'invalid constraints {constraints!r}')
+    checked = {}
+    for col, rules in constraints.items():
+        if col == '?' or col not in column_types or not isinstance(rules, dict):
+            raise ValueError(f'invalid constraints of column {col!r}')
+        checked[col] = validate_rules(column_types[col], rules)
+    return checked
+
+def read_binary(source) -> 'Database':
+    # a binary export or snapshot from outside; anything wrong with it is a ValueError
+    try:
+        return from_binary(BinaryReader(source))
+    except Exception as e:
+        raise ValueError(f'invalid binary data: {e}') from e
+
+def load(fp: BinaryIO) -> 'Database':
+    return from_binary(BinaryReader(decompress(iter(lambda: fp.read(CHUNK_SIZE), b''))))
+
+def decompress(chunks: Iterator[bytes]) -> bytearray:
+    decompressor = zlib.decompressobj()
+    data = bytearray()
+    for chunk in chunks:
+        data += decompressor.decompress(chunk)
+    data += decompressor.flush()
+    if not decompressor.eof:
+        raise ValueError('truncated snapshot')
+    return data
+
+def iter_header(db: 'Database') -> Iterator[str]:
+    yield SNAPSHOT_MAGIC.decode()
+    rest = b''
+    for chunk in iter_snapshot(db):
+        # encode a multiple of 3 bytes at a time so the pieces concatenate cleanly
+        data = rest + chunk
+        cut = len(data) - len(data) % 3
+        rest = data[cut:]
+        if cut:
+            yield base64.b64encode(data[:cut]).decode()
+    if rest:
+        yield base64.b64encode(rest).decode()
+
+def iter_line(fp: BinaryIO, data: bytes) -> Iterator[bytes]:
+    while True:
+        end = data.find(b'\n')
+        if end >= 0:
+            yield data[:end]
+            return
+        yield data
+        data = fp.read(CHUNK_SIZE)
+        if not data:
+            return
+
+def iter_base64_decode(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    rest = b''
+    for chunk in chunks:
+        data = rest + chunk.translate(None, b' \t\r')
+        cut = len(data) - len(data) % 4
+        rest = data[cut:]
+        if cut:
+            yield base64.b64decode(data[:cut])
+    if rest:
+        yield base64.b64decode(rest)
+
+def read_header(fp: BinaryIO) -> 'Database':
+    head = fp.read(3 + len(SNAPSHOT_MAGIC))
+    for comment in HEADER_COMMENTS:
+        if head.startswith(comment):
+            head = head[len(comment):]
+            break
+    else:
+        raise ValueError('missing metadata header')
+    try:
+        if head.startswith(SNAPSHOT_MAGIC):
+            chunks = iter_line(fp, head[len(SNAPSHOT_MAGIC):])
+            return from_binary(BinaryReader(decompress(iter_base64_decode(chunks))))
+        return loads_legacy(base64.b64decode(b''.join(iter_line(fp, head))))
+    except Exception as e:
+        # damaged data fails anywhere in the parsers, with struct, index, unicode... errors
+        raise ValueError(f'invalid metadata header: {e}') from e
+
+def loads_header(header: str | bytes) -> 'Database':
+    if isinstance(header, str):
+        header = header.encode()
+    return read_header(io.BytesIO(header))
+
+
+# every global a pickled Database of older exports refers to, under the names recent and older pandas/numpy use
+LEGACY_GLOBALS = {
+    ('tinymongo.db', 'Database'), ('tinymongo.db', 'Table'),
+    ('pandas', 'DataFrame'), ('pandas', 'Index'), ('pandas', 'RangeIndex'), ('pandas', 'StringDtype'),
+    ('pandas.core.frame', 'DataFrame'), ('pandas.core.indexes.base', 'Index'), ('pandas.core.indexes.base', '_new_Index'),
+    ('pandas.core.indexes.range', 'RangeIndex'), ('pandas.core.indexes.numeric', 'Int64Index'),
+    ('pandas.core.internals.managers', 'BlockManager'), ('pandas._libs.internals', '_unpickle_block'),
+    ('pandas.core.internals.blocks', 'new_block'), ('pandas.core.internals.blocks', 'ObjectBlock'),
+    ('pandas.core.internals.blocks', 'IntBlock'), ('pandas.core.internals.blocks', 'FloatBlock'),
+    ('pandas.core.internals.blocks', 'BoolBlock'),
+    ('pandas.arrays', 'ArrowStringArray'), ('pandas.core.arrays.string_arrow', 'ArrowStringArray'),
+    ('pandas.core.arrays.string_', 'StringDtype'),
+    ('numpy', 'dtype'), ('numpy', 'ndarray'),
+    ('numpy._core.multiarray', '_reconstruct'), ('numpy.core.multiarray', '_reconstruct'),
+    ('numpy._core.multiarray', 'scalar'), ('numpy.core.multiarray', 'scalar'),
+    ('numpy._core.numeric', '_frombuffer'), ('numpy.core.numeric', '_frombuffer'),
+    ('pyarrow.lib', '_restore_array'), ('pyarrow.lib', 'py_buffer'), ('pyarrow.lib', 'type_for_alias'),
+    ('_codecs', 'encode'), ('copyreg', '_reconstructor'), ('collections', 'OrderedDict'),
+}
+LEGACY_BUILTINS = {'object', 'dict', 'list', 'tuple', 'set', 'frozenset', 'slice', 'range',
+                   'complex', 'bytes', 'bytearray', 'str', 'int', 'float', 'bool'}
+
+class LegacyUnpickler(pkl.Unpickler):
+    # pickled headers of older exports; only the globals a pickled database needs are allowed
+    def find_class(self, module: str, name: str):
+        if module == '__main__' and name in ('Database', 'Table'):
+            module = 'tinymongo.db'
+        if module == '__builtin__':
+            module = 'builtins'
+        # dotted names would reach attributes of the allowed globals
+        if '.' not in name and ((module, name) in LEGACY_GLOBALS or (module == 'builtins' and name in LEGACY_BUILTINS)):
+            return super().find_class(module, name)
+        raise pkl.UnpicklingError(f'{module}.{name} is not allowed in metadata')
+
+def loads_legacy(data: bytes) -> 'Database':
+    db = LegacyUnpickler(io.BytesIO(data)).load()
+    if not isinstance(db, Database):
+        raise pkl.UnpicklingError('metadata is not a Database')
+    for table in db.tables.values():
+        table.constraints = checked_constraints(table.column_types, table.constraints)
+    return db
@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from tinymongo import snapshot
+from tinymongo.db import Database, Table
+
+SNAPSHOT_FILE = 'snapshot-{:012d}.tmdb'
+JOURNAL_FILE = 'journal-{:012d}.log'
+
+fsync = getattr(os, 'fdatasync', os.fsync)
+
+def json_default(value):
+    # numpy scalars, e.g. ids taken from a table index
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} cannot be journaled')
+
+def column_values(table: 'Table', ids: list, columns: list[str]) -> list[list]:
+    return [table.df.loc[ids, col].tolist() for col in columns]
+
+def make_record(event: str, table: 'Table', **kwargs) -> dict:
+    record = {'op': event, 'table': table.name, **kwargs}
+    if event == 'insert_rows':
+        record['columns'] = list(table.df.columns)
+        record['values'] = column_values(table, kwargs['ids'], record['columns'])
+    elif event == 'update_cells':
+        record['values'] = column_values(table, kwargs['ids'], kwargs['columns'])
+    elif event == 'replace_table':
+        record['ids'] = table.df.index.tolist()
+        record['columns'] = list(table.df.columns)
+        record['column_types'] = table.column_types
+        record['constraints'] = table.constraints
+        record['next_id'] = table._next_id
+        record['values'] = [table.df[col].tolist() for col in record['columns']]
+    return record
+
+def record_frame(table: 'Table', record: dict) -> pd.DataFrame:
+    df = pd.DataFrame(dict(zip(record['columns'], record['values'])), index=record['ids'], columns=record['columns'])
+    return df.astype(table.dtypes())
+
+def apply_record(db: 'Database', record: dict):
+    op = record['op']
+    if op == 'create_table':
+        db.create_table(record['table'])
+        return
+    if op == 'rename_table':
+        db.tables[record['old_name']].rename(record['table'])
+        return
+    if op == 'drop_table':
+        db.drop_table(record['table'])
+        return
+    table = db.tables[record['table']]
+    if op == 'add_column':
+        table.add_column(record['column'], record['col_type'])
+    elif op == 'drop_column':
+        table.drop_column(record['column'])
+    elif op == 'set_constraints':
+        table.set_constraints(record['column'], record['rules'])
+    elif op == 'insert_rows':
+        table.insert_rows(record_frame(table, record), record['after'])
+    elif op == 'delete_rows':
+        table.delete_rows(record['ids'])
+    elif op == 'update_cells':
+        table.update_cells(record['ids'], record['columns'], record['values'])
+    elif op == 'reid_rows':
+        table.reid_rows(record['ids'], record['new_ids'])
+    elif op == 'replace_table':
+        table.column_types = record['column_types']
+        table.df = record_frame(table, record)
+        table.compact()
+        table._next_id = record['next_id']
+        table.constraints = record.get('constraints', {})
+    else:
+        raise ValueError(f'unknown journal operation {op!r}')
+
+def read_journal(path: str):
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return      # torn write at the tail of a crashed session
+
+
+class Store:
+    # snapshot + append-only journal of every Database mutation, kept in one directory
+    def __init__(self, path: str, name: str = 'db', compact_size: int = 4 * 1024 * 1024):
+        self.path = path
+        self.name = name
+        self.compact_size = compact_size
+        self.db: Database | None = None
+        self.seq = 0
+        self._lock = threading.RLock()
+        self._journal = None
+        self._journal_size = 0
+        self._snapshot_size = 0
+        self._compactor: threading.Thread | None = None
+        os.makedirs(path, exist_ok=True)
+
+    def _files(self, prefix: str) -> list[tuple[int, str]]:
+        files = []
+        for name in os.listdir(self.path):
+            stem, ext = os.path.splitext(name)
+            if name.startswith(prefix) and ext in ('.tmdb', '.log'):
+                files.append((int(stem[len(prefix):]), os.path.join(self.path, name)))
+        return sorted(files)
+
+    def open(self) -> 'Database':
+        snapshots = self._files('snapshot-')
+        if snapshots:
+            base, path = snapshots[-1]
+            with open(path, 'rb') as f:
+                db = snapshot.load(f)
+            self._snapshot_size = os.path.getsize(path)
+        else:
+            base, db = 0, Database(self.name)
+        self.seq = base
+        for _, path in self._files('journal-'):
+            for record in read_journal(path):
+                if record['seq'] > base:
+                    apply_record(db, record)
+                    self.seq = record['seq']
+        self.db = db
+        self._open_journal()
+        db.observers.append(self)
+        return db
+
+    def _open_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+        # every session starts a fresh segment so a torn tail is never appended to
+        path = os.path.join(self.path, JOURNAL_FILE.format(self.seq + 1))
+        self._journal = open(path, 'a', encoding='utf-8')
+        self._journal_size = self._journal.tell()
+
+    def __call__(self, event: str, table: 'Table', **kwargs):
+        self.append(make_record(event, table, **kwargs))
+
+    def append(self, record: dict):
+        with self._lock:
+            self.seq += 1
+            record['seq'] = self.seq
+            line = json.dumps(record, ensure_ascii=False, default=json_default) + '\n'
+            self._journal.write(line)
+            self._journal.flush()
+            fsync(self._journal.fileno())
+            self._journal_size += len(line)
+            if self._journal_size > max(self.compact_size, self._snapshot_size):
+                # observers run under table locks and notify_lock, so the copy is left to the compactor thread
+                self.compact()
+
+    def compact(self, wait: bool = False):
+        with self._lock:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self._compact, daemon=True)
+                self._compactor.start()
+            compactor = self._compactor
+        if wait:
+            compactor.join()
+
+    def _compact(self):
+        # locks in the same order as writers: tables, notify_lock, then the journal
+        db = self.db
+        with db.read_locked(), db.notify_lock, self._lock:
+            state, seq = db.copy(), self.seq
+            self._open_journal()
+        self._write_snapshot(state, seq)
+
+    def _write_snapshot(self, state: 'Database', seq: int):
+        path = os.path.join(self.path, SNAPSHOT_FILE.format(seq))
+        with open(path + '.tmp', 'wb') as f:
+            size = snapshot.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self._sync_dir()
+        self._snapshot_size = size
+        # everything up to `seq` is now in the snapshot
+        for old_seq, old_path in self._files('snapshot-'):
+            if old_seq < seq:
+                os.remove(old_path)
+        for first_seq, old_path in self._files('journal-'):
+            if first_seq <= seq:
+                os.remove(old_path)
+
+    def _sync_dir(self):
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def reset(self, db: 'Database'):
+        # replace the stored database wholesale, e.g. after an import
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self.db is not None:
+                self.db.observers.remove(self)
+            self.db = db
+            db.observers.append(self)
+        self.compact(wait=True)
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self.db is not None:
+                self.db.observers.remove(self)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
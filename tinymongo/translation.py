@@ -4,9 +4,15 @@ class Translation:
     DeleteColumn = "Delete Column"
 
     InsertRow = "Insert row"
+    InsertCount = "Rows to insert"
     DeleteRow = "Delete row"
+    CascadeDelete = "Cascade"
     ImportDB = "Import DB"
     ExportDB = "Export DB"
+    LinkRefs = "Link refs"
+    LinkRefsHelp = "Resolve dbrefs into direct references once when the generated code loads"
+    PoolStrings = "Pool strings"
+    PoolStringsHelp = "Declare repeated strings once in the Python and C# exports and refer to them by index"
 
     ColumnExists = "Column {} already exists"
     TableExists = "Table {} already exists"
@@ -16,9 +22,52 @@ class Translation:
 
     CopyDBRef = "Copy ref"
     InvalidName = "Name should be a valid identifier"
-    InvalidDBRef = '{} is not a valid dbref in {}, row {}'
+    InvalidDBRef = '{} is not a valid dbref in {}.{}, row {}'
+    MoreErrors = '... and {} more'
+    DeleteBlocked = 'Cannot delete: {} references point at the selected rows'
+    ReferencedBy = 'Referenced by {}.{}, row {}'
+    ReferencedByCount = 'Referenced by {} cells'
+    RenameTable = "Rename Table"
 
     InvalidImportMetadata = "Invalid import metadata"
+    ImportRows = "Import rows"
+    InvalidImportFile = "Cannot import file: {}"
+    ImportedRows = "Imported {} rows into {}"
+
+    PageSize = "Rows per page"
+    Page = "Page"
+    SortBy = "Sort by"
+    Descending = "Descending"
+    FilterColumn = "Filter column"
+    Filter = "Contains"
+    Query = "Query"
+    InvalidQuery = "Invalid query: {}"
+    EditConflict = "The table was changed in another session; {} edits to rows deleted there were dropped"
+    RejectedCells = "{} edited cells do not fit their column type and were left unchanged: {}"
+    RowsShown = "Rows {} - {} of {}"
+    ExportCacheInfo = "Export cache: {hits} hits, {misses} misses, {entries} entries"
+    StringPoolInfo = "{} string pool: {} strings for {} cells, {} KB smaller ({:.1f}%)"
+    MemoryReport = "Memory usage"
+    Profiling = "Profiling"
+    DownloadProfile = "Download"
+    ClearProfile = "Clear"
+    MemoryTotal = "{} KB stored, {} KB with plain dtypes"
+    History = "History"
+    Undo = "Undo"
+    Redo = "Redo"
+    HistoryInfo = "{} versions, {} KB"
+    Checkpoint = "Checkpoint"
+    RestoreCheckpoint = "Restore"
+    ShowChanges = "Show last change"
+    Constraints = "Constraints"
+    ConstraintsHelp = "JSON rules, e.g. {{\"min\": 0, \"unique\": true}}. Available: {}"
+    ApplyConstraints = "Apply"
+    InvalidConstraints = "Invalid constraints: {}"
+    ConstraintViolation = '{!r} in {}.{}, row {} breaks {}'
+    ConstraintCount = "{} constraint violations"
+    Search = "Search"
+    SearchPlaceholder = "Name or id in any table"
+    NoSearchHits = "No matches"
 
 
 class TranslationCN:
@@ -27,9 +76,15 @@ class TranslationCN:
     DeleteColumn = "删除列"
 
     InsertRow = "插入行"
+    InsertCount = "插入行数"
     DeleteRow = "删除行"
+    CascadeDelete = "级联删除"
     ImportDB = "导入 DB"
     ExportDB = "导出 DB"
+    LinkRefs = "预解析引用"
+    LinkRefsHelp = "生成的代码加载时一次性把引用解析为对象"
+    PoolStrings = "字符串池"
+    PoolStringsHelp = "在 Python 和 C# 导出中只声明一次重复的字符串，按下标引用"
 
     ColumnExists = "列 {} 已经存在"
     TableExists = "表 {} 已经存在"
@@ -39,6 +94,49 @@ class TranslationCN:
 
     CopyDBRef = "复制引用"
     InvalidName = "名字必须是合法的标识符"
-    InvalidDBRef = '{} 不是一个的有效的引用，在表 {} 行 {}'
+    InvalidDBRef = '{} 不是一个的有效的引用，在表 {} 列 {} 行 {}'
+    MoreErrors = '... 还有 {} 个'
+    DeleteBlocked = '无法删除：有 {} 个引用指向选中的行'
+    ReferencedBy = '被表 {} 列 {} 行 {} 引用'
+    ReferencedByCount = '被 {} 个单元格引用'
+    RenameTable = "重命名表"
 
     InvalidImportMetadata = "导入的元数据无效"
+    ImportRows = "导入行"
+    InvalidImportFile = "无法导入文件：{}"
+    ImportedRows = "已导入 {} 行到表 {}"
+
+    PageSize = "每页行数"
+    Page = "页码"
+    SortBy = "排序"
+    Descending = "降序"
+    FilterColumn = "筛选列"
+    Filter = "包含"
+    Query = "查询"
+    InvalidQuery = "查询无效：{}"
+    EditConflict = "该表已在其他会话中被修改，{} 处针对已删除行的修改被丢弃"
+    RejectedCells = "{} 处修改的值与列类型不符，已保持原值：{}"
+    RowsShown = "第 {} - {} 行，共 {} 行"
+    ExportCacheInfo = "导出缓存：命中 {hits} 次，未命中 {misses} 次，{entries} 项"
+    StringPoolInfo = "{} 字符串池：{} 个字符串，替换 {} 处，缩小 {} KB（{:.1f}%）"
+    MemoryReport = "内存占用"
+    Profiling = "性能分析"
+    DownloadProfile = "下载"
+    ClearProfile = "清空"
+    MemoryTotal = "实际占用 {} KB，普通类型需 {} KB"
+    History = "历史"
+    Undo = "撤销"
+    Redo = "重做"
+    HistoryInfo = "{} 个版本，{} KB"
+    Checkpoint = "保存检查点"
+    RestoreCheckpoint = "恢复"
+    ShowChanges = "显示上次修改"
+    Constraints = "约束"
+    ConstraintsHelp = "JSON 规则，例如 {{\"min\": 0, \"unique\": true}}。可用：{}"
+    ApplyConstraints = "应用"
+    InvalidConstraints = "约束无效：{}"
+    ConstraintViolation = '{!r} 在表 {} 列 {} 行 {} 违反了 {}'
+    ConstraintCount = "{} 处违反约束"
+    Search = "搜索"
+    SearchPlaceholder = "在所有表中搜索名称或 id"
+    NoSearchHits = "没有匹配项"
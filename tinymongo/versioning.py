@@ -0,0 +1,225 @@
+import itertools
+from typing import NamedTuple
+
+import pandas as pd
+
+from tinymongo.columns import COLUMN_TYPES
+from tinymongo.db import Database, Table
+
+ALL = None      # every column of the table changed
+
+
+class TableVersion(NamedTuple):
+    index: pd.Index
+    columns: dict[str, pd.Series]     # series are shared with neighbouring versions while unchanged
+    column_types: dict[str, str]
+    next_id: int
+    constraints: dict[str, dict]
+
+
+class Version(NamedTuple):
+    id: int
+    label: str
+    tables: dict[str, TableVersion]   # unchanged tables are shared with the previous version
+
+
+class TableDiff(NamedTuple):
+    table: str
+    status: str                       # 'added', 'dropped' or 'changed'
+    added_columns: list[str]
+    dropped_columns: list[str]
+    added_ids: list[int]
+    deleted_ids: list[int]
+    changed_cells: dict[str, list[int]]
+
+
+def table_frame(version: TableVersion) -> pd.DataFrame:
+    return pd.DataFrame({col: values.copy() for col, values in version.columns.items()},
+                        index=version.index, columns=list(version.columns))
+
+def changed_ids(old: pd.Series, new: pd.Series, col_type_name: str) -> list[int]:
+    ids = old.index.intersection(new.index)
+    dtype = COLUMN_TYPES[col_type_name].dtype
+    old, new = old.loc[ids].astype(dtype), new.loc[ids].astype(dtype)
+    differs = (old != new) & ~(old.isna() & new.isna())
+    return ids[differs.to_numpy()].tolist()
+
+def diff(old: Version, new: Version) -> list[TableDiff]:
+    diffs = []
+    for name in old.tables.keys() - new.tables.keys():
+        diffs.append(TableDiff(name, 'dropped', [], [], [], old.tables[name].index.tolist(), {}))
+    for name, table in new.tables.items():
+        before = old.tables.get(name)
+        if before is table:
+            continue
+        if before is None:
+            diffs.append(TableDiff(name, 'added', list(table.columns), [], table.index.tolist(), [], {}))
+            continue
+        changed = {}
+        for col, values in table.columns.items():
+            if col in before.columns and before.columns[col] is not values:
+                ids = changed_ids(before.columns[col], values, table.column_types[col])
+                if ids:
+                    changed[col] = ids
+        diffs.append(TableDiff(
+            name, 'changed',
+            [col for col in table.columns if col not in before.columns],
+            [col for col in before.columns if col not in table.columns],
+            table.index.difference(before.index).tolist(),
+            before.index.difference(table.index).tolist(),
+            changed,
+        ))
+    return diffs
+
+
+class History:
+    # undo/redo over whole-database versions; each commit copies only the columns changed since the last one
+    def __init__(self, db: Database, budget: int = 64 * 1024 * 1024):
+        self.db = db
+        self.budget = budget
+        self.versions: list[Version] = []
+        self.cursor = -1
+        self.checkpoints: dict[str, Version] = {}
+        self._ids = itertools.count()
+        self._dirty: dict[str, set[str] | None] = {}
+        self._origin: dict[str, str] = {}      # renamed table -> its name in the head version
+        self._sizes: dict[int, tuple[object, int]] = {}
+        db.observers.append(self)
+        self.commit('initial')
+
+    @property
+    def head(self) -> Version | None:
+        return self.versions[self.cursor] if self.versions else None
+
+    def __call__(self, event: str, table: Table, **kwargs):
+        name = table.name
+        if event == 'rename_table':
+            old_name = kwargs['old_name']
+            self._origin[name] = self._origin.pop(old_name, old_name)
+            if old_name in self._dirty:
+                self._dirty[name] = self._dirty.pop(old_name)
+            return
+        if event in ('add_column', 'update_cells'):
+            dirty = self._dirty.setdefault(name, set())
+            if dirty is not ALL:
+                dirty.update([kwargs['column']] if event == 'add_column' else kwargs['columns'])
+        elif event in ('drop_column', 'set_constraints'):
+            self._dirty.setdefault(name, set())
+        else:
+            self._dirty[name] = ALL
+
+    def _capture(self, table: Table, before: TableVersion | None) -> TableVersion:
+        dirty = self._dirty.get(table.name, set()) if before is not None else ALL
+        columns = {}
+        for col in table.df.columns:
+            if dirty is not ALL and col not in dirty and col in before.columns:
+                columns[col] = before.columns[col]
+            else:
+                columns[col] = table.df[col].copy()
+        # pandas indexes are immutable, so the live one can be kept as is
+        return TableVersion(table.df.index, columns, dict(table.column_types), table._next_id,
+                            {col: dict(rules) for col, rules in table.constraints.items()})
+
+    def commit(self, label: str = '') -> Version:
+        with self.db.read_locked(), self.db.notify_lock:
+            return self._commit(label)
+
+    def _commit(self, label: str) -> Version:
+        # record the database as it is now, unless nothing changed since the head version
+        head = self.head
+        if head is not None and not self._dirty and not self._origin and head.tables.keys() == self.db.tables.keys():
+            return head
+        tables = {}
+        for name, table in self.db.tables.items():
+            before = head.tables.get(self._origin.get(name, name)) if head is not None else None
+            if before is not None and name not in self._dirty:
+                tables[name] = before
+            else:
+                tables[name] = self._capture(table, before)
+        self._dirty.clear()
+        self._origin.clear()
+        return self._append(Version(next(self._ids), label, tables))
+
+    def _append(self, version: Version) -> Version:
+        del self.versions[self.cursor + 1:]
+        self.versions.append(version)
+        self.cursor = len(self.versions) - 1
+        self._evict()
+        return version
+
+    def _restore(self, version: Version):
+        head, db = self.head, self.db
+        for name in [name for name in db.tables if name not in version.tables]:
+            db.drop_table(name)
+        for name, target in version.tables.items():
+            table = db.tables.get(name)
+            if table is None:
+                table = db.create_table(name)
+            elif head is not None and head.tables.get(name) is target:
+                continue
+            table.replace(table_frame(target), target.column_types, target.next_id, target.constraints)
+        db.tables = {name: db.tables[name] for name in version.tables}
+        # the events above only replayed `version`
+        self._dirty.clear()
+        self._origin.clear()
+
+    def can_undo(self) -> bool:
+        return self.cursor > 0
+
+    def can_redo(self) -> bool:
+        return self.cursor < len(self.versions) - 1
+
+    def undo(self) -> Version | None:
+        with self.db.write_locked(), self.db.notify_lock:
+            self._commit('')
+            if not self.can_undo():
+                return None
+            self._restore(self.versions[self.cursor - 1])
+            self.cursor -= 1
+            return self.head
+
+    def redo(self) -> Version | None:
+        with self.db.write_locked(), self.db.notify_lock:
+            self._commit('')
+            if not self.can_redo():
+                return None
+            self._restore(self.versions[self.cursor + 1])
+            self.cursor += 1
+            return self.head
+
+    def checkpoint(self, name: str) -> Version:
+        # named versions are kept regardless of the memory budget
+        self.checkpoints[name] = self.commit(name)
+        return self.checkpoints[name]
+
+    def restore(self, name: str) -> Version:
+        # restoring is itself a new version, so it can be undone
+        with self.db.write_locked(), self.db.notify_lock:
+            self._commit('')
+            checkpoint = self.checkpoints[name]
+            self._restore(checkpoint)
+            return self._append(Version(next(self._ids), f'restore {name}', checkpoint.tables))
+
+    def _size(self, obj) -> int:
+        # the cache holds on to `obj` so its id is not reused while cached
+        if id(obj) not in self._sizes:
+            size = obj.memory_usage(deep=True) if isinstance(obj, pd.Index) else obj.memory_usage(index=False, deep=True)
+            self._sizes[id(obj)] = (obj, int(size))
+        return self._sizes[id(obj)][1]
+
+    def memory_usage(self) -> int:
+        # bytes held by the history, counting every shared index or column once
+        with self.db.notify_lock:
+            seen = {}
+            for version in [*self.versions, *self.checkpoints.values()]:
+                for table in version.tables.values():
+                    seen[id(table.index)] = table.index
+                    for values in table.columns.values():
+                        seen[id(values)] = values
+            self._sizes = {key: size for key, size in self._sizes.items() if key in seen}
+            return sum(self._size(obj) for obj in seen.values())
+
+    def _evict(self):
+        while self.cursor > 0 and self.memory_usage() > self.budget:
+            self.versions.pop(0)
+            self.cursor -= 1